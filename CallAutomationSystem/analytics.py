@@ -0,0 +1,227 @@
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+import click
+from sqlalchemy import delete, func, insert, or_, select, update
+from db_writer import db_writer, mark_unchanged
+
+ROLLUP_DIMENSIONS = ('campaign', 'script', 'hour', 'outcome')
+ATTEMPT_OUTCOMES = ('Connected', 'Failed')
+RESPONSE_OUTCOMES = ('Accepted', 'Forwarded')
+
+
+def _bucket_columns():
+    from models import DURATION_BUCKETS
+
+    return [f'duration_bucket_{i}' for i in range(len(DURATION_BUCKETS) + 1)]
+
+
+def rollup_key(campaign: Optional[str], script: Optional[str], started_at: Optional[datetime],
+               outcome: str) -> tuple:
+    """(campaign, script, hour, outcome) rollup key for one call event"""
+    started_at = started_at or datetime.utcnow()
+    hour = started_at.replace(minute=0, second=0, microsecond=0)
+    return (campaign or 'default', script or 'default', hour, outcome)
+
+
+def rollup_increments(duration: Optional[int] = None, count: int = 1) -> Dict[str, int]:
+    """Counter increments for one call event"""
+    from models import DURATION_BUCKETS
+
+    increments = {'call_count': count}
+    if duration is not None:
+        increments['duration_count'] = count
+        increments['duration_sum'] = duration * count
+        increments[f'duration_bucket_{bisect_right(DURATION_BUCKETS, duration)}'] = count
+    return increments
+
+
+def apply_rollup(conn, key: tuple, increments: Dict[str, int]):
+    """Add increments to one rollup row, creating it if needed"""
+    from models import CallRollup
+
+    key_values = dict(zip(ROLLUP_DIMENSIONS, key))
+
+    if conn.dialect.name in ('sqlite', 'postgresql'):
+        if conn.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+
+        stmt = upsert(CallRollup).values(**key_values, **increments)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_DIMENSIONS),
+            set_={name: getattr(CallRollup, name) + stmt.excluded[name] for name in increments}
+        )
+        conn.execute(stmt)
+        return
+
+    result = conn.execute(
+        update(CallRollup)
+        .where(*[getattr(CallRollup, name) == value for name, value in key_values.items()])
+        .values({name: getattr(CallRollup, name) + value for name, value in increments.items()})
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(CallRollup).values(**key_values, **increments))
+
+
+def record_outcome(conn, campaign: Optional[str], script: Optional[str], started_at: Optional[datetime],
+                   outcome: str, duration: Optional[int] = None):
+    """Count one call event in the rollups; call inside a writer job"""
+    apply_rollup(conn, rollup_key(campaign, script, started_at, outcome), rollup_increments(duration))
+
+
+def query_rollups(group_by: Sequence[str] = ('campaign', 'script', 'outcome'), start: datetime = None,
+                  end: datetime = None, campaign: str = None, script: str = None) -> List[Dict]:
+    """Aggregate rollup rows over the requested dimensions"""
+    from app import db
+    from models import CallRollup, DURATION_BUCKETS
+
+    unknown = [name for name in group_by if name not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension: {', '.join(unknown)}")
+
+    dimensions = [getattr(CallRollup, name) for name in group_by]
+    bucket_columns = _bucket_columns()
+    counters = ['call_count', 'duration_count', 'duration_sum'] + bucket_columns
+
+    query = select(*dimensions, *[func.sum(getattr(CallRollup, name)).label(name) for name in counters])
+    if start:
+        query = query.where(CallRollup.hour >= start)
+    if end:
+        query = query.where(CallRollup.hour < end)
+    if campaign:
+        query = query.where(CallRollup.campaign == campaign)
+    if script:
+        query = query.where(CallRollup.script == script)
+    query = query.group_by(*dimensions).order_by(*dimensions)
+
+    results = []
+    for row in db.session.execute(query):
+        values = row._mapping
+        result = {name: values[name] for name in group_by}
+        result['call_count'] = values['call_count'] or 0
+        result['duration_count'] = values['duration_count'] or 0
+        result['duration_sum'] = values['duration_sum'] or 0
+        result['avg_duration'] = (
+            round(result['duration_sum'] / result['duration_count'], 1) if result['duration_count'] else None
+        )
+        result['duration_histogram'] = {
+            'bounds': list(DURATION_BUCKETS),
+            'counts': [values[name] or 0 for name in bucket_columns]
+        }
+        results.append(result)
+    return results
+
+
+def campaign_summary(hours: int = 24) -> List[Dict]:
+    """Per campaign and script totals and answer rate for the last few hours"""
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+
+    summary = {}
+    for row in query_rollups(group_by=('campaign', 'script', 'outcome'), start=since):
+        entry = summary.setdefault((row['campaign'], row['script']), {
+            'campaign': row['campaign'], 'script': row['script'],
+            'attempts': 0, 'connected': 0, 'failed': 0, 'accepted': 0, 'forwarded': 0,
+            'duration_sum': 0, 'duration_count': 0
+        })
+        entry[row['outcome'].lower()] = row['call_count']
+        if row['outcome'] in ATTEMPT_OUTCOMES:
+            entry['attempts'] += row['call_count']
+        else:
+            entry['duration_sum'] += row['duration_sum']
+            entry['duration_count'] += row['duration_count']
+
+    results = []
+    for entry in summary.values():
+        responses = entry['accepted'] + entry['forwarded']
+        entry['answer_rate'] = round(responses / entry['attempts'], 3) if entry['attempts'] else None
+        duration_sum = entry.pop('duration_sum')
+        duration_count = entry.pop('duration_count')
+        entry['avg_duration'] = round(duration_sum / duration_count, 1) if duration_count else None
+        results.append(entry)
+    return results
+
+
+def call_log_events(record: Dict):
+    """Rollup events implied by a stored call log: its dial attempt and any response
+
+    Yields (key, duration, recorded_at), where recorded_at is when the event
+    was written: created_at for the attempt and end_time for the response.
+    """
+    campaign, script = record.get('campaign'), record.get('script')
+    started_at = record.get('start_time') or record.get('created_at')
+
+    if record.get('call_status') == 'Failed':
+        yield rollup_key(campaign, script, started_at, 'Failed'), None, record.get('created_at')
+        return
+
+    yield rollup_key(campaign, script, started_at, 'Connected'), None, record.get('created_at')
+    if record.get('response') in RESPONSE_OUTCOMES:
+        yield (rollup_key(campaign, script, started_at, record['response']), record.get('duration'),
+               record.get('end_time'))
+
+
+def _add_event(totals: Dict, key: tuple, duration: Optional[int]):
+    counters = totals.setdefault(key, {})
+    for name, value in rollup_increments(duration).items():
+        counters[name] = counters.get(name, 0) + value
+
+
+def rebuild_rollups(engine) -> int:
+    """Recompute all rollups from the call log history, including archives
+
+    The history is scanned outside the writer and only counts events
+    recorded before a cutoff; events recorded after it, by calls and
+    responses that ran during the scan, are added inside the job that
+    replaces the table.
+    """
+    from models import CallLog, CallRollup
+    from retention import iter_call_log_history
+
+    def take_cutoff(conn):
+        # Every write job stamped before this one has committed once it returns
+        mark_unchanged(conn)
+        return datetime.utcnow()
+
+    cutoff = db_writer.execute(take_cutoff)
+
+    totals = {}
+    for record in iter_call_log_history(engine):
+        for key, duration, recorded_at in call_log_events(record):
+            if recorded_at is None or recorded_at < cutoff:
+                _add_event(totals, key, duration)
+
+    def replace_rollups(conn):
+        late = conn.execute(
+            select(*CallLog.__table__.columns)
+            .where(or_(CallLog.created_at >= cutoff, CallLog.end_time >= cutoff))
+        )
+        for row in late:
+            for key, duration, recorded_at in call_log_events(dict(row._mapping)):
+                if recorded_at is not None and recorded_at >= cutoff:
+                    _add_event(totals, key, duration)
+
+        conn.execute(delete(CallRollup))
+        for key, increments in totals.items():
+            apply_rollup(conn, key, increments)
+        return len(totals)
+
+    count = db_writer.execute(replace_rollups)
+    logging.info(f"Rebuilt {count} rollup rows")
+    return count
+
+
+@click.group('analytics')
+def analytics_cli():
+    """Campaign analytics commands."""
+
+
+@analytics_cli.command('rebuild')
+def rebuild_command():
+    """Recompute rollups from the call log history."""
+    from app import db
+
+    count = rebuild_rollups(db.engine)
+    click.echo(f"Rebuilt {count} rollup rows")
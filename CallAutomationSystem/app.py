@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
 from flask_sqlalchemy import SQLAlchemy
@@ -8,11 +9,24 @@ from datetime import datetime
 import json
 import csv
 import threading
+import click
 from call_automation import CallAutomationSystem
-from google_sheets_handler import GoogleSheetsHandler
+from db_writer import db_writer, configure_sqlite_engine
+from instrumentation import setup_logging
+import instrumentation
+import profiling
+from analytics import analytics_cli, campaign_summary, query_rollups
+from exporter import ExportError, export_command, export_response, parse_date
+from retention import history_response, retention_cli
+from read_layer import bump_data_version, fetch_call_logs, get_data_version, json_response, not_modified
+
+# Under "python app.py" this module is __main__; register it as "app" too so
+# "from app import db" in models and the other modules gets this instance
+if __name__ == '__main__':
+    sys.modules['app'] = sys.modules[__name__]
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+setup_logging()
 
 class Base(DeclarativeBase):
     pass
@@ -33,14 +47,36 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
 
 # Initialize extensions
 db.init_app(app)
+instrumentation.init_app(app)
+app.cli.add_command(export_command)
+app.cli.add_command(retention_cli)
+app.cli.add_command(analytics_cli)
+
+# Upper bound for list sizes requested through the JSON APIs
+MAX_API_PAGE_SIZE = 1000
 
 # Global automation system instance
 automation_system = None
 google_sheets_handler = None
 
 with app.app_context():
-    import models
-    db.create_all()
+    configure_sqlite_engine(db.engine)
+    db_writer.init_engine(db.engine)
+    db_writer.add_commit_hook(bump_data_version)
+    profiling.init_app(app, db.engine)
+
+def init_db():
+    """Create missing tables, columns and indexes"""
+    with app.app_context():
+        import models
+        db.create_all()
+        models.upgrade_schema()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema."""
+    init_db()
+    click.echo("Database schema is up to date")
 
 @app.route('/')
 def dashboard():
@@ -64,18 +100,38 @@ def api_queue_status():
     if not automation_system:
         automation_system = CallAutomationSystem()
     
-    return jsonify(automation_system.get_queue_statistics())
+    etag = f"stats-{get_data_version()}-{int(automation_system.is_running())}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return json_response(automation_system.get_queue_statistics(), etag=etag)
 
 @app.route('/api/recent-calls')
 def api_recent_calls():
     """API endpoint for recent call logs"""
-    global automation_system
-    if not automation_system:
-        automation_system = CallAutomationSystem()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_API_PAGE_SIZE)
+    
+    etag = f"recent-{get_data_version()}-{limit}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return json_response(fetch_call_logs(limit=limit), etag=etag)
+
+@app.route('/api/call-logs')
+def api_call_logs():
+    """API endpoint for paginated call logs"""
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 50, type=int), 1), MAX_API_PAGE_SIZE)
+    
+    etag = f"logs-{get_data_version()}-{page}-{per_page}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    limit = request.args.get('limit', 20, type=int)
-    calls = automation_system.get_recent_calls(limit=limit)
-    return jsonify(calls)
+    calls = fetch_call_logs(limit=per_page, offset=(page - 1) * per_page)
+    return json_response(calls, etag=etag)
 
 @app.route('/start-automation', methods=['POST'])
 def start_automation():
@@ -104,7 +160,7 @@ def start_automation():
             automation_system.load_queue_from_csv(csv_file)
         
         # Start automation in background thread
-        automation_thread = threading.Thread(target=automation_system.start_automation)
+        automation_thread = threading.Thread(target=automation_system.start_automation, name='dialer')
         automation_thread.daemon = True
         automation_thread.start()
         
@@ -175,6 +231,70 @@ def call_logs():
     
     return render_template('call_logs.html', calls=calls, page=page)
 
+@app.route('/api/analytics')
+def api_analytics():
+    """API endpoint for campaign rollups grouped by the requested dimensions"""
+    group_by = [name for name in request.args.get('group_by', 'campaign,script,outcome').split(',') if name]
+    
+    etag = f"analytics-{get_data_version()}-{request.query_string.decode()}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    try:
+        rows = query_rollups(
+            group_by=group_by,
+            start=parse_date(request.args.get('start')),
+            end=parse_date(request.args.get('end')),
+            campaign=request.args.get('campaign'),
+            script=request.args.get('script')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return json_response(rows, etag=etag)
+
+@app.route('/api/analytics/summary')
+def api_analytics_summary():
+    """API endpoint for the dashboard campaign analytics panel"""
+    hours = min(max(request.args.get('hours', 24, type=int), 1), 24 * 90)
+    
+    etag = f"summary-{get_data_version()}-{hours}-{datetime.utcnow():%Y%m%d%H}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    return json_response(campaign_summary(hours=hours), etag=etag)
+
+@app.route('/api/export/<dataset>')
+def api_export(dataset):
+    """Stream call logs or the call queue as CSV, JSONL or Parquet"""
+    try:
+        return export_response(
+            db.engine,
+            dataset,
+            request.args.get('format', 'csv'),
+            campaign=request.args.get('campaign'),
+            status=request.args.get('status'),
+            start=parse_date(request.args.get('start')),
+            end=parse_date(request.args.get('end'))
+        )
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/history/call-logs')
+def api_call_log_history():
+    """Stream call logs across the archive and the database as JSON Lines"""
+    try:
+        return history_response(
+            db.engine,
+            start=parse_date(request.args.get('start')),
+            end=parse_date(request.args.get('end')),
+            status=request.args.get('status')
+        )
+    except ExportError as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/api/call-response', methods=['POST'])
 def api_call_response():
     """Handle call response (Accept/Forward)"""
@@ -186,11 +306,13 @@ def api_call_response():
         data = request.get_json()
         call_id = data.get('call_id')
         response = data.get('response')  # 1 for Accept, 2 for Forward
+        # Retried deliveries repeat the same event id
+        event_id = data.get('event_id') or request.headers.get('I-Twilio-Idempotency-Token')
         
         if not call_id or not response:
             return jsonify({"error": "Missing call_id or response"}), 400
         
-        result = automation_system.handle_call_response(call_id, response)
+        result = automation_system.handle_call_response(call_id, str(response), event_id=event_id)
         return jsonify(result)
         
     except Exception as e:
@@ -226,4 +348,5 @@ def api_update_script():
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
+    init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,61 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child_env(database_url: str) -> dict:
+    """Environment for a child interpreter that imports app against database_url"""
+    env = dict(os.environ)
+    env['DATABASE_URL'] = database_url
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    # Dummy credentials, so code that builds the Twilio client eagerly shows
+    # up in the startup benchmark's heavy module list
+    for name, value in (('TWILIO_ACCOUNT_SID', 'ACbenchmark'), ('TWILIO_AUTH_TOKEN', 'benchmark'),
+                        ('TWILIO_PHONE_NUMBER', '+15550000000')):
+        env.setdefault(name, value)
+    return env
+
+
+def summarize(values: list) -> dict:
+    """Median, spread and p95 of a list of millisecond timings"""
+    ordered = sorted(values)
+    return {
+        'median_ms': round(statistics.median(ordered), 3),
+        'min_ms': round(ordered[0], 3),
+        'max_ms': round(ordered[-1], 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'samples': len(ordered),
+    }
+
+
+def run_metadata(benchmark: str) -> dict:
+    """Fields identifying a run so results can be compared later"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'benchmark': benchmark,
+        'timestamp': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def write_results(results: dict, output: str = None):
+    """Print results as JSON and optionally save them to a file"""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
@@ -0,0 +1,304 @@
+"""Database benchmark: hot queue and call log paths at 10k / 100k / 1M rows.
+
+For every backend and dataset size a fresh child interpreter builds a
+synthetic CallQueue / CallLog dataset, then times:
+
+    csv_ingest            load_queue_from_csv() of the whole queue
+    next_call_claim       first pop() of a new prefetch buffer (claims a batch)
+    get_queue_statistics  CallAutomationSystem.get_queue_statistics()
+    get_call_logs_*       first, middle and last page of get_call_logs()
+    handle_call_response  one keypad response for a call without a response
+
+SQLite always runs on a throwaway file. Postgres runs when --postgres-url
+(or BENCH_POSTGRES_URL) points at a reachable database; its tables are
+dropped and recreated, so never point it at real data.
+
+    python benchmarks/database.py --sizes 10000,100000 --output before.json
+    python benchmarks/database.py --sizes 10000,100000 --baseline before.json
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from bench_utils import APP_DIR, child_env, run_metadata, summarize, write_results
+
+DEFAULT_SIZES = '10000,100000,1000000'
+DEFAULT_POSTGRES_URL = 'postgresql+psycopg2://localhost/call_automation_bench'
+
+CAMPAIGNS = ('spring-sale', 'renewals', 'win-back', 'default')
+SCRIPTS = ('default', 'sales', 'support')
+PRIORITIES = ('high', 'medium', 'low', '1', '2', '3')
+
+# Share of queue rows per status after ingest, applied on id % 10
+QUEUE_STATUSES = ('Not Called',) * 4 + ('Connected', 'Connected', 'Accepted', 'Forwarded', 'Failed', 'Retry Scheduled')
+LOG_STATUSES = ('Connected', 'Connected', 'Accepted', 'Forwarded', 'Failed')
+
+INSERT_CHUNK_SIZE = 10000
+LOGS_PER_PAGE = 50
+
+
+def write_queue_csv(path: str, rows: int, rng: random.Random):
+    """Synthetic call queue CSV in the upload format"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['phone_number', 'caller_name', 'priority', 'script', 'campaign'])
+        for i in range(rows):
+            writer.writerow([
+                f"+1555{i:07d}",
+                f"Caller {i}",
+                rng.choice(PRIORITIES),
+                rng.choice(SCRIPTS),
+                rng.choice(CAMPAIGNS),
+            ])
+
+
+def assign_queue_statuses(engine):
+    """Spread queue rows over the dialer statuses so claims and stats see a realistic mix"""
+    from sqlalchemy import case, update
+    from models import CallQueue
+
+    with engine.begin() as conn:
+        conn.execute(update(CallQueue).values(status=case(
+            {index: status for index, status in enumerate(QUEUE_STATUSES)},
+            value=CallQueue.id % len(QUEUE_STATUSES)
+        )))
+
+
+def insert_call_logs(engine, log_rows: int, rng: random.Random) -> list:
+    """Insert synthetic call logs linked to queue rows; return call SIDs still awaiting a response"""
+    from sqlalchemy import insert, select
+    from models import CallLog, CallQueue
+
+    with engine.connect() as conn:
+        queue = conn.execute(
+            select(CallQueue.id, CallQueue.phone_number, CallQueue.caller_name,
+                   CallQueue.campaign, CallQueue.assigned_script).order_by(CallQueue.id)
+        ).all()
+
+    now = datetime.utcnow()
+    pending = []
+    with engine.begin() as conn:
+        for start in range(0, log_rows, INSERT_CHUNK_SIZE):
+            batch = []
+            for i in range(start, min(start + INSERT_CHUNK_SIZE, log_rows)):
+                entry = queue[i % len(queue)]
+                status = rng.choice(LOG_STATUSES)
+                started = now - timedelta(seconds=rng.randrange(90 * 24 * 3600))
+                answered = status in ('Accepted', 'Forwarded')
+                duration = rng.randrange(5, 400) if answered else None
+                call_sid = f"CA{uuid.UUID(int=rng.getrandbits(128)).hex}"
+                if status == 'Connected':
+                    pending.append(call_sid)
+                batch.append({
+                    'phone_number': entry.phone_number,
+                    'caller_name': entry.caller_name,
+                    'call_status': status,
+                    'call_sid': None if status == 'Failed' else call_sid,
+                    'queue_id': entry.id,
+                    'start_time': started,
+                    'end_time': started + timedelta(seconds=duration or 0),
+                    'duration': duration,
+                    'response': status if answered else None,
+                    'campaign': entry.campaign,
+                    'script': entry.assigned_script,
+                    'created_at': started,
+                    'updated_at': started,
+                })
+            conn.execute(insert(CallLog), batch)
+    return pending
+
+
+def timed(func, repeat: int, cleanup=None) -> dict:
+    """Call func repeat times in fresh app contexts and summarize the timings
+
+    cleanup, if given, receives func's result after each sample and runs
+    outside the timed region.
+    """
+    from app import app
+
+    timings = []
+    for _ in range(repeat):
+        with app.app_context():
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+            if cleanup:
+                cleanup(result)
+    return summarize(timings)
+
+
+def run_child(args):
+    """Build one dataset against DATABASE_URL and time every operation"""
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+
+    from app import app, db, init_db
+    from call_automation import CallAutomationSystem
+    from call_queue_buffer import CallQueueBuffer
+    from db_writer import db_writer
+    from models import CallQueue  # also registers every table for drop_all()
+    from sqlalchemy import update
+
+    rng = random.Random(args.seed)
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            db.drop_all()
+        init_db()
+        engine = db.engine
+
+    system = CallAutomationSystem()
+    operations = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'queue.csv')
+        write_queue_csv(csv_path, args.rows, rng)
+        operations['csv_ingest'] = timed(lambda: system.load_queue_from_csv(csv_path), 1)
+
+    setup_started = time.perf_counter()
+    with app.app_context():
+        assign_queue_statuses(engine)
+        pending = insert_call_logs(engine, args.log_rows, rng)
+    setup_seconds = time.perf_counter() - setup_started
+
+    def claim():
+        buffer = CallQueueBuffer()
+        next_call = buffer.pop()
+        if next_call is None:
+            raise RuntimeError("No call left to claim")
+        return buffer, next_call
+
+    def unclaim(claimed):
+        # Hand the whole batch back so every sample sees the same queue
+        buffer, next_call = claimed
+        buffer.release()
+        db_writer.execute(lambda conn: conn.execute(
+            update(CallQueue).where(CallQueue.id == next_call.id).values(status='Not Called')
+        ))
+
+    operations['next_call_claim'] = timed(claim, args.repeat, cleanup=unclaim)
+
+    operations['get_queue_statistics'] = timed(system.get_queue_statistics, args.repeat)
+
+    last_page = max(1, -(-args.log_rows // LOGS_PER_PAGE))
+    for name, page in (('first', 1), ('middle', max(1, last_page // 2)), ('last', last_page)):
+        operations[f'get_call_logs_{name}_page'] = dict(
+            timed(lambda: system.get_call_logs(page=page, per_page=LOGS_PER_PAGE), args.repeat),
+            page=page
+        )
+
+    responses = iter(rng.sample(pending, min(args.repeat, len(pending))))
+
+    def respond():
+        result = system.handle_call_response(next(responses), '1', event_id=uuid.uuid4().hex)
+        if not result.get('success') or result.get('duplicate'):
+            raise RuntimeError(f"Call response was not applied: {result}")
+
+    operations['handle_call_response'] = timed(respond, min(args.repeat, len(pending)))
+
+    db_writer.stop()
+    print(json.dumps({
+        'backend': engine.dialect.name,
+        'rows': args.rows,
+        'log_rows': args.log_rows,
+        'setup_seconds': round(setup_seconds, 2),
+        'operations': operations,
+    }))
+
+
+def postgres_available(url: str):
+    """None if Postgres at url accepts connections, otherwise the reason it was skipped"""
+    try:
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine(url)
+        with engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+        engine.dispose()
+        return None
+    except Exception as e:
+        return str(e).splitlines()[0]
+
+
+def compare(results: dict, baseline_path: str):
+    """Add median change versus a previous results file to every operation"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    previous = {
+        (run['backend'], run['rows'], name): timing['median_ms']
+        for run in baseline.get('runs', [])
+        for name, timing in run['operations'].items()
+    }
+    results['baseline'] = {key: baseline.get(key) for key in ('commit', 'timestamp')}
+
+    for run in results['runs']:
+        for name, timing in run['operations'].items():
+            before = previous.get((run['backend'], run['rows'], name))
+            if before:
+                timing['baseline_median_ms'] = before
+                timing['change_pct'] = round((timing['median_ms'] - before) / before * 100, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Comma separated queue sizes.')
+    parser.add_argument('--log-ratio', type=float, default=1.0, help='Call log rows per queue row.')
+    parser.add_argument('--repeat', type=int, default=20, help='Samples per timed operation.')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data.')
+    parser.add_argument('--postgres-url', default=os.environ.get('BENCH_POSTGRES_URL', DEFAULT_POSTGRES_URL),
+                        help='Postgres database to benchmark; its tables are dropped.')
+    parser.add_argument('--no-postgres', action='store_true', help='Only benchmark SQLite.')
+    parser.add_argument('--baseline', help='Previous results file to compare medians against.')
+    parser.add_argument('--output', help='Also write the JSON results to this file.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--log-rows', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = {**run_metadata('database'), 'repeat': args.repeat, 'seed': args.seed, 'runs': [], 'skipped': []}
+
+    backends = []
+    with tempfile.TemporaryDirectory() as tmp:
+        backends.append(('sqlite', lambda size: f"sqlite:///{os.path.join(tmp, f'bench-{size}.db')}"))
+        if not args.no_postgres:
+            reason = postgres_available(args.postgres_url)
+            if reason:
+                results['skipped'].append({'backend': 'postgresql', 'reason': reason})
+            else:
+                backends.append(('postgresql', lambda size: args.postgres_url))
+
+        for backend, url_for in backends:
+            for size in sizes:
+                print(f"Benchmarking {backend} with {size} rows...", file=sys.stderr)
+                output = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), '--child',
+                     '--rows', str(size), '--log-rows', str(int(size * args.log_ratio)),
+                     '--repeat', str(args.repeat), '--seed', str(args.seed)],
+                    cwd=APP_DIR, env=child_env(url_for(size)), capture_output=True, text=True
+                )
+                if output.returncode != 0:
+                    errors = output.stderr.strip().splitlines() or ['child process failed']
+                    results['skipped'].append({'backend': backend, 'rows': size, 'reason': errors[-1]})
+                    continue
+                results['runs'].append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+    write_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
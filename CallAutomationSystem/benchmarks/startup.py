@@ -0,0 +1,115 @@
+"""Startup benchmark: import time of app.py and time to the first request.
+
+Every measurement runs in a fresh interpreter against a throwaway SQLite
+database, so module caches and warm connections do not hide regressions.
+
+    python benchmarks/startup.py --runs 5 --output startup.json
+    python benchmarks/startup.py --import-budget-ms 800 --first-request-budget-ms 1500
+
+Results are printed as JSON. With a budget set the script exits non-zero
+when the median exceeds it, so CI can fail on slow worker boots.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from bench_utils import APP_DIR, child_env, run_metadata, summarize, write_results
+
+# Runs in the child interpreter; prints a JSON object with its timings
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+timings = {'import_ms': (imported - started) * 1000}
+if sys.argv[1]:
+    response = app.app.test_client().get(sys.argv[1])
+    timings['first_request_ms'] = (time.perf_counter() - imported) * 1000
+    timings['status'] = response.status_code
+timings['heavy_modules_loaded'] = sorted(
+    name for name in ('twilio', 'gspread', 'google.oauth2', 'pandas', 'pyarrow') if name in sys.modules
+)
+print(json.dumps(timings))
+"""
+
+
+def run_probe(database_url: str, path: str) -> dict:
+    """Import app (and optionally serve one request) in a fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, path],
+        cwd=APP_DIR, env=child_env(database_url), capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(database_url: str, limit: int = 15) -> list:
+    """Top modules by cumulative import time, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=APP_DIR, env=child_env(database_url), capture_output=True, text=True, check=True
+    ).stderr
+
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # app itself and its direct imports; deeper entries are counted in their parent
+        if len(name) - len(name.lstrip()) > 3:
+            continue
+        modules.append({'module': name.strip(), 'cumulative_ms': int(cumulative) / 1000})
+    modules.sort(key=lambda entry: entry['cumulative_ms'], reverse=True)
+    return modules[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per measurement.')
+    parser.add_argument('--path', default='/api/queue-status', help='Route used for the first request.')
+    parser.add_argument('--import-budget-ms', type=float, help='Fail when the median import time exceeds this.')
+    parser.add_argument('--first-request-budget-ms', type=float,
+                        help='Fail when the median time to the first response exceeds this.')
+    parser.add_argument('--output', help='Also write the JSON results to this file.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        subprocess.run(
+            [sys.executable, '-c', 'import app; app.init_db()'],
+            cwd=APP_DIR, env=child_env(database_url), check=True
+        )
+
+        import_runs = [run_probe(database_url, '') for _ in range(args.runs)]
+        request_runs = [run_probe(database_url, args.path) for _ in range(args.runs)]
+        imports = slowest_imports(database_url)
+
+    results = {
+        **run_metadata('startup'),
+        'runs': args.runs,
+        'import': summarize([run['import_ms'] for run in import_runs]),
+        'first_request': dict(
+            summarize([run['first_request_ms'] for run in request_runs]),
+            path=args.path,
+            status=request_runs[-1]['status']
+        ),
+        'heavy_modules_after_import': import_runs[-1]['heavy_modules_loaded'],
+        'heavy_modules_after_first_request': request_runs[-1]['heavy_modules_loaded'],
+        'slowest_imports': imports,
+    }
+
+    failures = []
+    if args.import_budget_ms and results['import']['median_ms'] > args.import_budget_ms:
+        failures.append(f"import {results['import']['median_ms']} ms > {args.import_budget_ms} ms")
+    if args.first_request_budget_ms and results['first_request']['median_ms'] > args.first_request_budget_ms:
+        failures.append(f"first request {results['first_request']['median_ms']} ms > "
+                        f"{args.first_request_budget_ms} ms")
+    results['budget_failures'] = failures
+
+    write_results(results, args.output)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,23 +6,27 @@ import time
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioException
+from sqlalchemy import delete, insert, select, update
+from call_queue_buffer import CLAIMED_STATUS, CallQueueBuffer
+from db_writer import db_writer, elapsed_seconds, insert_if_absent, mark_unchanged
+from analytics import record_outcome
+from instrumentation import MAKE_CALL_SECONDS, WEBHOOK_EVENTS, WEBHOOK_SECONDS
+
+# Keypad digits accepted by the call-response webhook
+RESPONSE_CODES = {"1": "Accepted", "2": "Forwarded"}
 
 class CallAutomationSystem:
     """Main class for handling call automation"""
     
     def __init__(self):
         self.twilio_client = None
+        self.twilio_phone_number = None
         self.is_automation_running = False
         self.current_call = None
-        self.call_queue = []
+        self.call_queue = CallQueueBuffer()
         self.call_scripts = {}
         self.automation_thread = None
         
-        # Initialize Twilio client
-        self._init_twilio_client()
-        
         # Load call scripts
         self._load_call_scripts()
     
@@ -36,6 +40,8 @@ class CallAutomationSystem:
                 logging.error("Twilio credentials not found in environment variables")
                 return
             
+            from twilio.rest import Client
+            
             self.twilio_client = Client(account_sid, auth_token)
             self.twilio_phone_number = os.environ.get("TWILIO_PHONE_NUMBER")
             
@@ -45,7 +51,13 @@ class CallAutomationSystem:
             logging.info("Twilio client initialized successfully")
             
         except Exception as e:
-            logging.error(f"Error initializing Twilio client: {str(e)}")
+            logging.error("Error initializing Twilio client: %s", e)
+    
+    def _client(self):
+        """Twilio client, created on the first call so web workers never import the SDK"""
+        if self.twilio_client is None:
+            self._init_twilio_client()
+        return self.twilio_client
     
     def _load_call_scripts(self):
         """Load call scripts from JSON file"""
@@ -59,7 +71,7 @@ class CallAutomationSystem:
                 "default": "Hello, this is an automated call from our service. Please press 1 to accept or 2 to forward this call."
             }
         except Exception as e:
-            logging.error(f"Error loading call scripts: {str(e)}")
+            logging.error("Error loading call scripts: %s", e)
             self.call_scripts = {
                 "default": "Hello, this is an automated call from our service. Please press 1 to accept or 2 to forward this call."
             }
@@ -81,67 +93,88 @@ class CallAutomationSystem:
     def load_queue_from_csv(self, csv_file: str):
         """Load call queue from CSV file"""
         try:
-            from app import app, db
-            from models import CallQueue
-            
-            with app.app_context():
-                with open(csv_file, 'r') as f:
-                    reader = csv.DictReader(f)
-                    
-                    # Clear existing queue
-                    CallQueue.query.delete()
-                    
-                    for row in reader:
-                        queue_item = CallQueue(
-                            phone_number=row.get('phone_number', ''),
-                            caller_name=row.get('caller_name', ''),
-                            priority=self._convert_priority(row.get('priority', '1')),
-                            assigned_script=row.get('script', 'default')
-                        )
-                        db.session.add(queue_item)
-                    
-                    db.session.commit()
-                    logging.info(f"Loaded {CallQueue.query.count()} calls from CSV")
+            with open(csv_file, 'r') as f:
+                reader = csv.DictReader(f)
                 
+                rows = [
+                    {
+                        'phone_number': row.get('phone_number', ''),
+                        'caller_name': row.get('caller_name', ''),
+                        'priority': self._convert_priority(row.get('priority', '1')),
+                        'assigned_script': row.get('script', 'default'),
+                        'campaign': row.get('campaign') or 'default'
+                    }
+                    for row in reader
+                ]
+            
+            loaded = self._replace_queue(rows)
+            logging.info("Loaded %s calls from CSV", loaded)
+            
         except Exception as e:
-            logging.error(f"Error loading queue from CSV: {str(e)}")
+            logging.error("Error loading queue from CSV: %s", e)
             raise
     
     def load_queue_from_google_sheets(self, sheet_url: str):
         """Load call queue from Google Sheets"""
         try:
-            from app import db
-            from models import CallQueue
             from google_sheets_handler import GoogleSheetsHandler
             
             sheets_handler = GoogleSheetsHandler()
             data = sheets_handler.read_call_queue(sheet_url)
             
-            # Clear existing queue
-            CallQueue.query.delete()
-            
-            for row in data:
-                queue_item = CallQueue(
-                    phone_number=row.get('phone_number', ''),
-                    caller_name=row.get('caller_name', ''),
-                    priority=int(row.get('priority', 1)),
-                    assigned_script=row.get('script', 'default')
-                )
-                db.session.add(queue_item)
+            rows = [
+                {
+                    'phone_number': row.get('phone_number', ''),
+                    'caller_name': row.get('caller_name', ''),
+                    'priority': int(row.get('priority', 1)),
+                    'assigned_script': row.get('script', 'default'),
+                    'campaign': row.get('campaign') or 'default'
+                }
+                for row in data
+            ]
             
-            db.session.commit()
-            logging.info(f"Loaded {len(data)} calls from Google Sheets")
+            self._replace_queue(rows)
+            logging.info("Loaded %s calls from Google Sheets", len(data))
             
         except Exception as e:
-            logging.error(f"Error loading queue from Google Sheets: {str(e)}")
+            logging.error("Error loading queue from Google Sheets: %s", e)
             raise
     
+    def _replace_queue(self, rows: List[Dict]) -> int:
+        """Replace the whole call queue with the given rows in one write"""
+        from models import CallLog, CallQueue
+        
+        def replace_queue(conn):
+            # Unlink old logs first: SQLite does not enforce ON DELETE SET NULL
+            # and would hand the freed ids to the new queue rows. The flag keeps
+            # late responses for these calls away from the new rows.
+            conn.execute(
+                update(CallLog)
+                .where(CallLog.queue_id.isnot(None))
+                .values(queue_id=None, queue_unlinked=True)
+            )
+            
+            # Clear existing queue
+            conn.execute(delete(CallQueue))
+            if rows:
+                conn.execute(insert(CallQueue), rows)
+            return len(rows)
+        
+        loaded = db_writer.execute(replace_queue)
+        self.call_queue.clear()
+        return loaded
+    
     def make_call(self, phone_number: str, script: str = "default") -> Optional[Dict]:
         """Make a call using Twilio"""
-        if not self.twilio_client or not self.twilio_phone_number:
+        client = self._client()
+        if not client or not self.twilio_phone_number:
             logging.error("Twilio client not properly initialized")
             return None
         
+        from twilio.base.exceptions import TwilioException
+        
+        started = time.perf_counter()
+        result = 'error'
         try:
             # Get script content
             script_content = self.call_scripts.get(script, self.call_scripts.get("default", ""))
@@ -149,14 +182,15 @@ class CallAutomationSystem:
             # Create TwiML for the call
             twiml_url = self._create_twiml_url(script_content)
             
-            call = self.twilio_client.calls.create(
+            call = client.calls.create(
                 to=phone_number,
                 from_=self.twilio_phone_number,
                 url=twiml_url,
                 method='GET'
             )
             
-            logging.info(f"Call initiated to {phone_number}, SID: {call.sid}")
+            logging.info("Call initiated to %s, SID: %s", phone_number, call.sid)
+            result = 'ok'
             
             return {
                 'call_sid': call.sid,
@@ -166,11 +200,13 @@ class CallAutomationSystem:
             }
             
         except TwilioException as e:
-            logging.error(f"Twilio error making call to {phone_number}: {str(e)}")
+            logging.error("Twilio error making call to %s: %s", phone_number, e)
             return None
         except Exception as e:
-            logging.error(f"Error making call to {phone_number}: {str(e)}")
+            logging.error("Error making call to %s: %s", phone_number, e)
             return None
+        finally:
+            MAKE_CALL_SECONDS.observe(time.perf_counter() - started, result=result)
     
     def _create_twiml_url(self, script_content: str) -> str:
         """Create TwiML URL for call script"""
@@ -201,69 +237,95 @@ class CallAutomationSystem:
         logging.info("Starting call automation")
         
         try:
-            from app import app, db
-            from models import CallQueue, CallLog
+            from app import app
             
             with app.app_context():
-                while self.is_automation_running:
-                    # Get next call from queue
-                    next_call = CallQueue.query.filter_by(status='Not Called').order_by(CallQueue.priority.desc(), CallQueue.created_at.asc()).first()
-                    
-                    if not next_call:
-                        logging.info("No more calls in queue")
-                        self.is_automation_running = False
-                        break
-                    
-                    # Update status to calling
-                    next_call.status = 'Calling'
-                    next_call.attempts += 1
-                    db.session.commit()
-                    
-                    # Make the call
-                    call_result = self.make_call(next_call.phone_number, next_call.assigned_script)
-                    
-                    if call_result:
-                        # Create call log
-                        call_log = CallLog(
-                            phone_number=next_call.phone_number,
-                            caller_name=next_call.caller_name,
-                            call_status='Connected',
-                            call_sid=call_result['call_sid'],
-                            start_time=datetime.utcnow()
-                        )
-                        db.session.add(call_log)
+                # Claims of a dialer that crashed or was killed would otherwise stay parked forever
+                self.call_queue.reset_stale_claims()
+                
+                try:
+                    while self.is_automation_running:
+                        # Get next call from the prefetch buffer
+                        next_call = self.call_queue.pop()
                         
-                        # Update queue status
-                        next_call.status = 'Connected'
+                        if not next_call:
+                            logging.info("No more calls in queue")
+                            self.is_automation_running = False
+                            break
                         
-                    else:
-                        # Call failed
-                        call_log = CallLog(
-                            phone_number=next_call.phone_number,
-                            caller_name=next_call.caller_name,
-                            call_status='Failed',
-                            start_time=datetime.utcnow(),
-                            end_time=datetime.utcnow()
-                        )
-                        db.session.add(call_log)
+                        # Make the call
+                        call_result = self.make_call(next_call.phone_number, next_call.assigned_script)
+                        attempts = next_call.attempts + 1
                         
-                        # Check if we should retry
-                        if next_call.attempts < next_call.max_attempts:
-                            next_call.status = 'Retry Scheduled'
+                        if call_result:
+                            # Create call log
+                            call_log = dict(
+                                phone_number=next_call.phone_number,
+                                caller_name=next_call.caller_name,
+                                call_status='Connected',
+                                call_sid=call_result['call_sid'],
+                                start_time=datetime.utcnow(),
+                                campaign=next_call.campaign,
+                                script=next_call.assigned_script
+                            )
+                            status = 'Connected'
+                            
                         else:
-                            next_call.status = 'Failed'
-                    
-                    db.session.commit()
-                    
-                    # Wait between calls
-                    time.sleep(5)
+                            # Call failed
+                            call_log = dict(
+                                phone_number=next_call.phone_number,
+                                caller_name=next_call.caller_name,
+                                call_status='Failed',
+                                start_time=datetime.utcnow(),
+                                end_time=datetime.utcnow(),
+                                campaign=next_call.campaign,
+                                script=next_call.assigned_script
+                            )
+                            
+                            # Check if we should retry
+                            if attempts < next_call.max_attempts:
+                                status = 'Retry Scheduled'
+                            else:
+                                status = 'Failed'
+                        
+                        # Log the call and update queue status; the writer
+                        # commits in the background so the next dial is not delayed
+                        db_writer.submit(self._record_call_job(next_call.id, status, call_log))
+                        
+                        # Wait between calls
+                        time.sleep(5)
+                finally:
+                    # Hand unused claims back so another run can pick them up
+                    self.call_queue.release()
         
         except Exception as e:
-            logging.error(f"Error in automation loop: {str(e)}")
+            logging.error("Error in automation loop: %s", e)
         finally:
             self.is_automation_running = False
             logging.info("Call automation stopped")
     
+    @staticmethod
+    def _record_call_job(queue_id: int, status: str, call_log: Dict):
+        """Build the write job that stores one dial attempt"""
+        from models import CallQueue, CallLog
+        
+        def record_call(conn):
+            # The queue may have been reloaded while the call was in flight, and
+            # SQLite reuses ids, so only the row this dialer still holds counts
+            matched = conn.execute(
+                update(CallQueue)
+                .where(CallQueue.id == queue_id,
+                       CallQueue.status == CLAIMED_STATUS,
+                       CallQueue.phone_number == call_log['phone_number'])
+                .values(status=status, attempts=CallQueue.attempts + 1)
+            ).rowcount
+            link = {'queue_id': queue_id} if matched else {'queue_unlinked': True}
+            conn.execute(insert(CallLog).values(**link, **call_log))
+            record_outcome(conn, call_log['campaign'], call_log['script'],
+                           call_log['start_time'], call_log['call_status'])
+        
+        return record_call
+    
     def stop_automation(self):
         """Stop the call automation process"""
         self.is_automation_running = False
@@ -273,79 +335,137 @@ class CallAutomationSystem:
         """Check if automation is currently running"""
         return self.is_automation_running
     
-    def handle_call_response(self, call_id: str, response: str) -> Dict:
-        """Handle response from call recipient"""
+    def handle_call_response(self, call_id: str, response: str, event_id: str = None) -> Dict:
+        """Handle response from call recipient
+        
+        The first response for a call wins: the update only matches a log that
+        has no response yet, so repeated webhook deliveries change nothing.
+        Deliveries carrying an event id are additionally deduplicated on it.
+        """
         try:
-            from app import db
-            from models import CallLog, CallQueue
+            from models import CallLog, CallQueue, WebhookEvent
             
-            call_log = CallLog.query.filter_by(call_sid=call_id).first()
+            outcome = RESPONSE_CODES.get(response)
             
-            if not call_log:
-                return {"error": "Call not found"}
-            
-            if response == "1":
-                # Accept call
-                call_log.response = "Accepted"
-                call_log.call_status = "Accepted"
-                call_log.end_time = datetime.utcnow()
+            def apply_response(conn):
+                if not outcome:
+                    return self._current_response(conn, call_id)
+                
+                end_time = datetime.utcnow()
+                values = {'response': outcome, 'call_status': outcome, 'end_time': end_time}
+                duration = elapsed_seconds(conn.dialect, CallLog.start_time, end_time)
+                if duration is not None:
+                    values['duration'] = duration
+                
+                stmt = (
+                    update(CallLog)
+                    .where(CallLog.call_sid == call_id, CallLog.response.is_(None))
+                    .values(**values)
+                )
+                if conn.dialect.update_returning:
+                    call_log = conn.execute(stmt.returning(
+                        CallLog.id, CallLog.queue_id, CallLog.queue_unlinked, CallLog.phone_number,
+                        CallLog.start_time, CallLog.duration, CallLog.campaign, CallLog.script
+                    )).first()
+                else:
+                    call_log = None
+                    if conn.execute(stmt).rowcount:
+                        call_log = conn.execute(
+                            select(CallLog.id, CallLog.queue_id, CallLog.queue_unlinked, CallLog.phone_number,
+                                   CallLog.start_time, CallLog.duration, CallLog.campaign, CallLog.script)
+                            .where(CallLog.call_sid == call_id, CallLog.response == outcome)
+                            .limit(1)
+                        ).first()
+                
+                if not call_log:
+                    # Unknown call, or a response was already recorded
+                    return self._current_response(conn, call_id, duplicate=True)
                 
-                # Update queue status
-                queue_item = CallQueue.query.filter_by(phone_number=call_log.phone_number).first()
-                if queue_item:
-                    queue_item.status = "Accepted"
+                if call_log.duration is None and call_log.start_time:
+                    conn.execute(
+                        update(CallLog)
+                        .where(CallLog.id == call_log.id)
+                        .values(duration=int((end_time - call_log.start_time).total_seconds()))
+                    )
                 
-            elif response == "2":
-                # Forward call
-                call_log.response = "Forwarded"
-                call_log.call_status = "Forwarded"
-                call_log.end_time = datetime.utcnow()
+                # Update queue status; a log unlinked by a queue reload has no
+                # queue row left, so only the rollups are updated for it
+                queue_filter = None
+                if call_log.queue_id is not None:
+                    queue_filter = CallQueue.id == call_log.queue_id
+                elif not call_log.queue_unlinked:
+                    # Logs written before queue_id existed only know the number
+                    queue_filter = CallQueue.id == (
+                        select(CallQueue.id)
+                        .where(CallQueue.phone_number == call_log.phone_number)
+                        .limit(1)
+                        .scalar_subquery()
+                    )
+                if queue_filter is not None:
+                    conn.execute(update(CallQueue).where(queue_filter).values(status=outcome))
                 
-                # Update queue status
-                queue_item = CallQueue.query.filter_by(phone_number=call_log.phone_number).first()
-                if queue_item:
-                    queue_item.status = "Forwarded"
+                record_outcome(conn, call_log.campaign, call_log.script, call_log.start_time,
+                               outcome, call_log.duration)
+                
+                return {"success": True, "response": outcome}
             
-            # Calculate duration
-            if call_log.start_time and call_log.end_time:
-                duration = (call_log.end_time - call_log.start_time).total_seconds()
-                call_log.duration = int(duration)
+            def apply_delivery(conn):
+                if event_id and not insert_if_absent(conn, WebhookEvent, event_id=event_id):
+                    return self._current_response(conn, call_id, duplicate=True)
+                
+                result = apply_response(conn)
+                if result is None and event_id:
+                    # Unknown call, perhaps because its log is not committed yet;
+                    # forget the event id so a retry of this delivery is applied
+                    conn.execute(delete(WebhookEvent).where(WebhookEvent.event_id == event_id))
+                return result
             
-            db.session.commit()
+            with WEBHOOK_SECONDS.time():
+                result = db_writer.execute(apply_delivery)
+            if result is None:
+                WEBHOOK_EVENTS.inc(result='not_found')
+                return {"error": "Call not found"}
             
-            return {"success": True, "response": call_log.response}
+            WEBHOOK_EVENTS.inc(result='duplicate' if result.get('duplicate') else 'applied')
+            return result
             
         except Exception as e:
-            logging.error(f"Error handling call response: {str(e)}")
+            WEBHOOK_EVENTS.inc(result='error')
+            logging.error("Error handling call response: %s", e)
             return {"error": str(e)}
     
+    @staticmethod
+    def _current_response(conn, call_id: str, duplicate: bool = False) -> Optional[Dict]:
+        """Result for a response that changed nothing, or None if the call is unknown"""
+        from models import CallLog
+        
+        mark_unchanged(conn)
+        call_log = conn.execute(
+            select(CallLog.response).where(CallLog.call_sid == call_id).limit(1)
+        ).first()
+        if not call_log:
+            return None
+        
+        result = {"success": True, "response": call_log.response}
+        if duplicate:
+            result["duplicate"] = True
+        return result
+    
     def get_queue_statistics(self) -> Dict:
         """Get current queue statistics"""
         try:
-            from models import CallQueue
-            
-            total_calls = CallQueue.query.count()
-            not_called = CallQueue.query.filter_by(status='Not Called').count()
-            connected = CallQueue.query.filter_by(status='Connected').count()
-            accepted = CallQueue.query.filter_by(status='Accepted').count()
-            forwarded = CallQueue.query.filter_by(status='Forwarded').count()
-            failed = CallQueue.query.filter_by(status='Failed').count()
+            from read_layer import fetch_queue_statistics
             
-            return {
-                'total_calls': total_calls,
-                'not_called': not_called,
-                'connected': connected,
-                'accepted': accepted,
-                'forwarded': forwarded,
-                'failed': failed,
-                'is_running': self.is_automation_running
-            }
+            stats = fetch_queue_statistics()
+            stats['is_running'] = self.is_automation_running
+            return stats
             
         except Exception as e:
-            logging.error(f"Error getting queue statistics: {str(e)}")
+            logging.error("Error getting queue statistics: %s", e)
             return {
                 'total_calls': 0,
                 'not_called': 0,
+                'claimed': 0,
                 'connected': 0,
                 'accepted': 0,
                 'forwarded': 0,
@@ -362,7 +482,7 @@ class CallAutomationSystem:
             return [call.to_dict() for call in recent_calls]
             
         except Exception as e:
-            logging.error(f"Error getting recent calls: {str(e)}")
+            logging.error("Error getting recent calls: %s", e)
             return []
     
     def get_call_logs(self, page: int = 1, per_page: int = 50) -> List[Dict]:
@@ -374,5 +494,5 @@ class CallAutomationSystem:
             return [call.to_dict() for call in calls]
             
         except Exception as e:
-            logging.error(f"Error getting call logs: {str(e)}")
+            logging.error("Error getting call logs: %s", e)
             return []
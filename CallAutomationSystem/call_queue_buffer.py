@@ -0,0 +1,183 @@
+import atexit
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import select, update
+from config import Config
+from db_writer import db_writer, mark_unchanged
+from instrumentation import QUEUE_CLAIM_SECONDS, QUEUE_CLAIMED_ROWS
+
+# Queue rows held by a dialer's in-memory buffer are parked in this status so
+# that no other dialer claims them; they go back to 'Not Called' on release.
+CLAIMED_STATUS = 'Claimed'
+
+
+class QueuedCall:
+    """Compact in-memory record for a claimed CallQueue row"""
+
+    __slots__ = ('sort_key', 'id', 'phone_number', 'caller_name',
+                 'assigned_script', 'campaign', 'attempts', 'max_attempts')
+
+    def __init__(self, id, priority, created_at, phone_number, caller_name,
+                 assigned_script, campaign, attempts, max_attempts):
+        # Same order as the dialer query: highest priority first, then oldest
+        self.sort_key = (-(priority or 0), created_at or datetime.min, id)
+        self.id = id
+        self.phone_number = phone_number
+        self.caller_name = caller_name
+        self.assigned_script = assigned_script
+        self.campaign = campaign
+        self.attempts = attempts or 0
+        self.max_attempts = max_attempts or 0
+
+    def __lt__(self, other):
+        return self.sort_key < other.sort_key
+
+    def __repr__(self):
+        return f'<QueuedCall {self.id} {self.phone_number}>'
+
+
+class CallQueueBuffer:
+    """Prefetching priority buffer between the CallQueue table and the dialer
+
+    Eligible rows are claimed from the database in batches and kept in a heap,
+    so taking the next call is an in-memory pop. The buffer refills when it
+    drops below the low-water mark. Claims and releases are committed through
+    the shared database writer.
+    """
+
+    def __init__(self, batch_size: int = None, low_water_mark: int = None):
+        self.batch_size = batch_size or Config.QUEUE_PREFETCH_BATCH_SIZE
+        self.low_water_mark = min(
+            low_water_mark if low_water_mark is not None else Config.QUEUE_PREFETCH_LOW_WATER_MARK,
+            self.batch_size
+        )
+        self._heap: List[QueuedCall] = []
+        self._lock = threading.Lock()
+        self._source_exhausted = False
+        self._release_at_exit = False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def pop(self) -> Optional[QueuedCall]:
+        """Return the next call to dial, refilling from the database if needed"""
+        with self._lock:
+            if not self._heap or (len(self._heap) < self.low_water_mark and not self._source_exhausted):
+                self._refill()
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)
+
+    def _refill(self):
+        """Claim up to a batch of eligible rows and push them onto the heap"""
+        from models import CallQueue
+
+        wanted = self.batch_size - len(self._heap)
+        if wanted <= 0:
+            return
+
+        def claim_batch(conn):
+            rows = conn.execute(
+                select(CallQueue.id, CallQueue.priority, CallQueue.created_at,
+                       CallQueue.phone_number, CallQueue.caller_name,
+                       CallQueue.assigned_script, CallQueue.campaign, CallQueue.attempts,
+                       CallQueue.max_attempts)
+                .where(CallQueue.status == 'Not Called')
+                .order_by(CallQueue.priority.desc(), CallQueue.created_at.asc())
+                .limit(wanted)
+                .with_for_update(skip_locked=True)
+            ).all()
+
+            if rows:
+                conn.execute(
+                    update(CallQueue)
+                    .where(CallQueue.id.in_([row.id for row in rows]),
+                           CallQueue.status == 'Not Called')
+                    .values(status=CLAIMED_STATUS, updated_at=datetime.utcnow())
+                )
+            else:
+                mark_unchanged(conn)
+            return rows
+
+        with QUEUE_CLAIM_SECONDS.time():
+            rows = db_writer.execute(claim_batch)
+        QUEUE_CLAIMED_ROWS.inc(len(rows))
+
+        for row in rows:
+            heapq.heappush(self._heap, QueuedCall(*row))
+        if rows and not self._release_at_exit:
+            # Hand claims back on a normal shutdown (SIGTERM, reload); the dialer
+            # runs in a daemon thread whose finally block never runs then
+            atexit.register(self.release)
+            self._release_at_exit = True
+
+        # A short batch means the table is drained for now; only go back to the
+        # database once the heap is empty instead of on every pop.
+        self._source_exhausted = len(rows) < wanted
+        logging.info("Claimed %s calls from queue (%s buffered)", len(rows), len(self._heap))
+
+    def release(self):
+        """Return all unused claims to the queue"""
+        with self._lock:
+            self._cancel_release_at_exit()
+            if not self._heap:
+                return
+
+            from models import CallQueue
+
+            ids = [item.id for item in self._heap]
+            self._heap = []
+            self._source_exhausted = False
+
+            def release_claims(conn):
+                released = conn.execute(
+                    update(CallQueue)
+                    .where(CallQueue.id.in_(ids), CallQueue.status == CLAIMED_STATUS)
+                    .values(status='Not Called')
+                ).rowcount
+                if not released:
+                    mark_unchanged(conn)
+
+            try:
+                db_writer.execute(release_claims)
+                logging.info("Released %s unused call claims", len(ids))
+            except Exception as e:
+                logging.error("Error releasing call claims: %s", e)
+
+    def reset_stale_claims(self, max_age: int = None) -> int:
+        """Return claims older than max_age seconds, left behind by a dialer that died, to the queue"""
+        from models import CallQueue
+
+        max_age = Config.QUEUE_CLAIM_TIMEOUT_SECONDS if max_age is None else max_age
+        cutoff = datetime.utcnow() - timedelta(seconds=max_age)
+
+        def reset_claims(conn):
+            count = conn.execute(
+                update(CallQueue)
+                .where(CallQueue.status == CLAIMED_STATUS, CallQueue.updated_at < cutoff)
+                .values(status='Not Called')
+            ).rowcount
+            if not count:
+                mark_unchanged(conn)
+            return count
+
+        count = db_writer.execute(reset_claims)
+        if count:
+            logging.warning("Returned %s stale call claims to the queue", count)
+        return count
+
+    def clear(self):
+        """Drop buffered calls without touching the database (e.g. after the queue was replaced)"""
+        with self._lock:
+            self._cancel_release_at_exit()
+            self._heap = []
+            self._source_exhausted = False
+
+    def _cancel_release_at_exit(self):
+        # Called with the lock held once the buffer holds no claims
+        if self._release_at_exit:
+            atexit.unregister(self.release)
+            self._release_at_exit = False
@@ -13,6 +13,12 @@ class Config:
         "pool_pre_ping": True,
     }
     
+    # SQLite production mode (applied on connect when DATABASE_URL is SQLite)
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    DB_WRITER_MAX_BATCH = int(os.environ.get("DB_WRITER_MAX_BATCH", "500"))
+    
     # Twilio configuration
     TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID")
     TWILIO_AUTH_TOKEN = os.environ.get("TWILIO_AUTH_TOKEN")
@@ -25,8 +31,30 @@ class Config:
     CALL_RETRY_LIMIT = int(os.environ.get("CALL_RETRY_LIMIT", "3"))
     CALL_INTERVAL_SECONDS = int(os.environ.get("CALL_INTERVAL_SECONDS", "5"))
     
+    # Dialer prefetch buffer settings
+    QUEUE_PREFETCH_BATCH_SIZE = int(os.environ.get("QUEUE_PREFETCH_BATCH_SIZE", "200"))
+    QUEUE_PREFETCH_LOW_WATER_MARK = int(os.environ.get("QUEUE_PREFETCH_LOW_WATER_MARK", "20"))
+    # Claims older than this are treated as left behind by a dead dialer; keep it
+    # well above the time needed to dial a whole prefetch batch
+    QUEUE_CLAIM_TIMEOUT_SECONDS = int(os.environ.get("QUEUE_CLAIM_TIMEOUT_SECONDS", "3600"))
+    
+    # Export settings
+    EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "5000"))
+    
+    # Call log retention settings
+    LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", "90"))
+    ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "archive")
+    ARCHIVE_FORMAT = os.environ.get("ARCHIVE_FORMAT", "jsonl.gz")
+    
     # Logging configuration
-    LOG_LEVEL = os.environ.get("LOG_LEVEL", "DEBUG")
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")  # text or json
+    
+    # Profiling settings; the admin endpoints are disabled while ADMIN_TOKEN is unset
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+    PROFILE_ALL_REQUESTS = os.environ.get("PROFILE_ALL_REQUESTS", "false").lower() == "true"
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", "0.005"))
     
     @staticmethod
     def validate_environment():
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+from sqlalchemy import Integer, cast, event, func, insert, literal, select
+from config import Config
+from instrumentation import DB_COMMIT_BATCH_SIZE, DB_COMMIT_SECONDS, DB_WRITE_QUEUE_DEPTH
+
+
+def configure_sqlite_engine(engine):
+    """Apply production pragmas to every new SQLite connection of an engine"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # WAL lets the dashboard and webhooks read while the writer commits
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        finally:
+            cursor.close()
+
+    logging.info(f"SQLite production mode enabled (WAL, synchronous={Config.SQLITE_SYNCHRONOUS})")
+
+
+def insert_if_absent(conn, model, **values) -> bool:
+    """Insert a row unless one with the same key exists; True if it was inserted"""
+    if conn.dialect.name in ('sqlite', 'postgresql'):
+        if conn.dialect.name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        result = conn.execute(dialect_insert(model).values(**values).on_conflict_do_nothing())
+        return result.rowcount == 1
+
+    key = [getattr(model, name) == value for name, value in values.items()
+           if getattr(model, name).primary_key]
+    if conn.execute(select(*model.__table__.primary_key.columns).where(*key)).first():
+        return False
+    conn.execute(insert(model).values(**values))
+    return True
+
+
+def elapsed_seconds(dialect, start_column, end_time):
+    """SQL expression for whole seconds from a datetime column to end_time
+
+    Returns None on dialects without a known expression, so callers compute
+    the value in Python instead.
+    """
+    end = literal(end_time)
+    if dialect.name == 'sqlite':
+        # julianday is a float in days; the small offset guards against
+        # 4.99999 truncating to 4
+        return cast((func.julianday(end) - func.julianday(start_column)) * 86400 + 0.001, Integer)
+    if dialect.name == 'postgresql':
+        return cast(func.floor(func.extract('epoch', end - start_column)), Integer)
+    return None
+
+
+_STOP = object()
+
+# conn.info key set by a job that turned out to change nothing
+_UNCHANGED = 'db_writer_unchanged'
+
+
+def mark_unchanged(conn):
+    """Tell the writer that the running job changed no data the app serves
+
+    Commit hooks are skipped for a group in which every job did so, which
+    keeps no-op writes (duplicate webhooks, empty claims) from bumping the
+    data version. Bookkeeping rows such as webhook event ids do not count.
+    """
+    conn.info[_UNCHANGED] = True
+
+
+class DatabaseWriter:
+    """Single point through which all database writes are committed
+
+    A write job is a callable that receives a SQLAlchemy Connection inside an
+    open transaction and returns a result. On SQLite the jobs are executed by
+    one background thread that groups everything queued into a single commit,
+    so writers never contend for the database lock. On other databases jobs
+    run inline in the caller's thread, each in its own transaction.
+    """
+
+    def __init__(self, max_batch: int = None):
+        self.max_batch = max_batch or Config.DB_WRITER_MAX_BATCH
+        self.engine = None
+        self.threaded = False
+        self._queue = queue.Queue()
+        self._thread = None
+        self._commit_hooks = []
+
+    def init_engine(self, engine):
+        """Bind the writer to an engine and start the writer thread if needed"""
+        self.engine = engine
+        self.threaded = engine.dialect.name == 'sqlite'
+
+        if self.threaded and not self._thread:
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def add_commit_hook(self, hook: Callable):
+        """Register a callable run with the connection at the end of every group that changed data"""
+        self._commit_hooks.append(hook)
+
+    def submit(self, job: Callable) -> Future:
+        """Queue a write job and return a Future for its result"""
+        future = Future()
+        if self.threaded:
+            self._queue.put((job, future))
+        else:
+            self._commit_batch([(job, future)])
+        return future
+
+    def execute(self, job: Callable) -> Any:
+        """Run a write job and wait for it to be committed"""
+        return self.submit(job).result()
+
+    def stop(self):
+        """Commit any pending jobs and stop the writer thread"""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """Writer thread: drain the queue and commit in groups"""
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            stopping = False
+            # Everything that queued up while the last commit ran goes into
+            # this one, so throughput grows with load instead of lock waits.
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            DB_WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+            self._commit_batch(batch)
+            if stopping:
+                break
+
+    def _commit_batch(self, batch):
+        """Run a group of jobs in one transaction, isolating failures"""
+        started = time.perf_counter()
+        try:
+            with self.engine.begin() as conn:
+                results = []
+                changed = False
+                for job, _ in batch:
+                    conn.info.pop(_UNCHANGED, None)
+                    results.append(job(conn))
+                    changed = changed or not conn.info.pop(_UNCHANGED, False)
+                if changed:
+                    for hook in self._commit_hooks:
+                        hook(conn)
+        except Exception as e:
+            DB_COMMIT_SECONDS.observe(time.perf_counter() - started, result='error')
+            if len(batch) == 1:
+                logging.error(f"Database write failed: {str(e)}")
+                batch[0][1].set_exception(e)
+                return
+            # Retry one by one so a bad job does not fail its neighbours
+            for item in batch:
+                self._commit_batch([item])
+            return
+
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started, result='ok')
+        DB_COMMIT_BATCH_SIZE.observe(len(batch))
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+# Global writer instance, bound to the app's engine in app.py
+db_writer = DatabaseWriter()
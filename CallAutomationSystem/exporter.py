@@ -0,0 +1,196 @@
+import csv
+import io
+import sys
+import tempfile
+from datetime import datetime
+from typing import Iterator, List, Optional
+import click
+from flask import Response, send_file
+from sqlalchemy import Boolean, DateTime, Integer, select
+from config import Config
+from read_layer import dumps
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+EXPORT_DATASETS = ('call_logs', 'call_queue')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(ValueError):
+    """Raised for invalid export parameters"""
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO date or datetime filter value"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f"Invalid date: {value}")
+
+
+def build_export_query(dataset: str, campaign: str = None, status: str = None,
+                       start: datetime = None, end: datetime = None):
+    """Select every column of a dataset with the optional filters applied
+
+    Dates filter on created_at, start inclusive and end exclusive.
+    """
+    from models import CallLog, CallQueue
+
+    if dataset == 'call_logs':
+        model, status_column = CallLog, CallLog.call_status
+    elif dataset == 'call_queue':
+        model, status_column = CallQueue, CallQueue.status
+    else:
+        raise ExportError(f"Unknown dataset: {dataset}")
+
+    query = select(*model.__table__.columns).order_by(model.id)
+
+    if campaign:
+        query = query.where(model.campaign == campaign)
+    if status:
+        query = query.where(status_column == status)
+    if start:
+        query = query.where(model.created_at >= start)
+    if end:
+        query = query.where(model.created_at < end)
+
+    return query
+
+
+def iter_partitions(engine, query, chunk_size: int = None) -> Iterator[List]:
+    """Yield result rows in chunks from a server-side cursor"""
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_SIZE
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for partition in result.partitions():
+            yield partition
+
+
+def iter_csv(columns: List[str], partitions) -> Iterator[str]:
+    """Stream CSV text, one chunk of rows per yielded string"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in rows
+        )
+        yield buffer.getvalue()
+
+
+def iter_jsonl(columns: List[str], partitions) -> Iterator[bytes]:
+    """Stream JSON Lines, one chunk of rows per yielded bytes object"""
+    for rows in partitions:
+        yield b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def write_parquet(target, columns, partitions):
+    """Write chunks to a Parquet file, one row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export requires pyarrow")
+
+    # Fixed schema so chunks full of NULLs do not change the inferred types
+    fields = []
+    for column in columns:
+        if isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    schema = pa.schema(fields)
+
+    with pq.ParquetWriter(target, schema, compression='snappy') as writer:
+        for rows in partitions:
+            data = {column.name: [row[i] for row in rows] for i, column in enumerate(columns)}
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+
+
+def export_dataset(engine, dataset: str, fmt: str, output, **filters):
+    """Export a dataset to a writable file object (binary for Parquet and JSONL)"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format: {fmt}")
+
+    query = build_export_query(dataset, **filters)
+    partitions = iter_partitions(engine, query)
+
+    if fmt == 'parquet':
+        write_parquet(output, list(query.selected_columns), partitions)
+    elif fmt == 'jsonl':
+        for chunk in iter_jsonl(query.selected_columns.keys(), partitions):
+            output.write(chunk)
+    else:
+        for chunk in iter_csv(query.selected_columns.keys(), partitions):
+            output.write(chunk)
+
+
+def export_response(engine, dataset: str, fmt: str, **filters) -> Response:
+    """HTTP response streaming an export; raises ExportError on bad parameters"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown format: {fmt}")
+
+    query = build_export_query(dataset, **filters)
+    filename = f"{dataset}.{fmt}"
+
+    if fmt == 'parquet':
+        # Parquet writes its footer last, so spool to disk and send the file
+        spool = tempfile.TemporaryFile()
+        write_parquet(spool, list(query.selected_columns), iter_partitions(engine, query))
+        spool.seek(0)
+        return send_file(spool, mimetype=MIMETYPES[fmt], as_attachment=True, download_name=filename)
+
+    columns = query.selected_columns.keys()
+    partitions = iter_partitions(engine, query)
+    chunks = iter_jsonl(columns, partitions) if fmt == 'jsonl' else iter_csv(columns, partitions)
+    return Response(
+        chunks,
+        mimetype=MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@click.command('export')
+@click.argument('dataset', type=click.Choice(EXPORT_DATASETS))
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='csv', show_default=True)
+@click.option('--campaign', help='Campaign to filter on.')
+@click.option('--status', help='Call or queue status to filter on.')
+@click.option('--start', help='Only rows created at or after this ISO date.')
+@click.option('--end', help='Only rows created before this ISO date.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Output file (default: stdout).')
+def export_command(dataset, fmt, campaign, status, start, end, output):
+    """Stream call logs or the call queue to CSV, JSONL or Parquet."""
+    from app import db
+
+    if fmt == 'parquet' and not output:
+        raise click.UsageError("Parquet export needs --output")
+
+    try:
+        filters = dict(campaign=campaign, status=status, start=parse_date(start), end=parse_date(end))
+
+        if output:
+            mode = 'w' if fmt == 'csv' else 'wb'
+            with open(output, mode, newline='' if fmt == 'csv' else None) as f:
+                export_dataset(db.engine, dataset, fmt, f, **filters)
+        else:
+            stream = sys.stdout if fmt == 'csv' else sys.stdout.buffer
+            export_dataset(db.engine, dataset, fmt, stream, **filters)
+    except ExportError as e:
+        raise click.UsageError(str(e))
@@ -3,6 +3,7 @@ import logging
 from typing import List, Dict, Optional
 import gspread
 from google.oauth2.service_account import Credentials
+from instrumentation import SHEETS_REQUEST_SECONDS
 
 class GoogleSheetsHandler:
     """Handler for Google Sheets integration"""
@@ -11,6 +12,7 @@ class GoogleSheetsHandler:
         self.client = None
         self._init_client()
     
+    @SHEETS_REQUEST_SECONDS.timed(operation='authorize')
     def _init_client(self):
         """Initialize Google Sheets client"""
         try:
@@ -39,6 +41,7 @@ class GoogleSheetsHandler:
         except Exception as e:
             logging.error(f"Error initializing Google Sheets client: {str(e)}")
     
+    @SHEETS_REQUEST_SECONDS.timed(operation='read_call_queue')
     def read_call_queue(self, sheet_url: str, worksheet_name: str = None) -> List[Dict]:
         """Read call queue data from Google Sheets"""
         if not self.client:
@@ -64,7 +67,8 @@ class GoogleSheetsHandler:
                     'phone_number': str(record.get('phone_number', '')).strip(),
                     'caller_name': str(record.get('caller_name', '')).strip(),
                     'priority': self._safe_int(record.get('priority', 1)),
-                    'script': str(record.get('script', 'default')).strip()
+                    'script': str(record.get('script', 'default')).strip(),
+                    'campaign': str(record.get('campaign', '') or 'default').strip()
                 }
                 
                 # Only add records with valid phone numbers
@@ -78,6 +82,7 @@ class GoogleSheetsHandler:
             logging.error(f"Error reading from Google Sheets: {str(e)}")
             raise
     
+    @SHEETS_REQUEST_SECONDS.timed(operation='update_call_status')
     def update_call_status(self, sheet_url: str, phone_number: str, status: str, 
                           response: str = None, timestamp: str = None, 
                           worksheet_name: str = None):
@@ -137,6 +142,7 @@ class GoogleSheetsHandler:
         except Exception as e:
             logging.error(f"Error updating Google Sheets: {str(e)}")
     
+    @SHEETS_REQUEST_SECONDS.timed(operation='add_call_log')
     def add_call_log(self, sheet_url: str, call_data: Dict, worksheet_name: str = "Call_Logs"):
         """Add call log entry to Google Sheets"""
         if not self.client:
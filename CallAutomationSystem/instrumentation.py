@@ -0,0 +1,238 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Sequence, Tuple
+from config import Config
+
+# Default latency buckets in seconds, from sub-millisecond DB work up to slow Twilio/Sheets calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    """Escape a value for a double-quoted Prometheus label or log field"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = '') -> str:
+    """Render a Prometheus label set such as {endpoint="dashboard",method="GET"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Base class holding per-label-set values behind one lock"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return '\n'.join(lines)
+
+    def _render_samples(self, items):
+        for key, value in items:
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {value}'
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    type_name = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator observing the duration of every call of a function"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _render_samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {count}'
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Dialer
+MAKE_CALL_SECONDS = Histogram('call_automation_make_call_seconds',
+                              'Time spent placing a call through Twilio.', ['result'])
+QUEUE_CLAIM_SECONDS = Histogram('call_automation_queue_claim_seconds',
+                                'Time spent claiming a batch of queue rows.')
+QUEUE_CLAIMED_ROWS = Counter('call_automation_queue_claimed_rows_total',
+                             'Queue rows claimed into the prefetch buffer.')
+
+# Database writer
+DB_COMMIT_SECONDS = Histogram('call_automation_db_commit_seconds',
+                              'Time spent running and committing one group of write jobs.', ['result'])
+DB_COMMIT_BATCH_SIZE = Histogram('call_automation_db_commit_batch_size',
+                                 'Write jobs per committed group.',
+                                 buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500))
+DB_WRITE_QUEUE_DEPTH = Gauge('call_automation_db_write_queue_depth',
+                             'Write jobs waiting for the writer thread.')
+
+# Integrations and webhooks
+SHEETS_REQUEST_SECONDS = Histogram('call_automation_sheets_request_seconds',
+                                   'Time spent in Google Sheets operations.', ['operation'])
+WEBHOOK_SECONDS = Histogram('call_automation_webhook_seconds',
+                            'Time spent handling call responses.')
+WEBHOOK_EVENTS = Counter('call_automation_webhook_events_total',
+                         'Call responses by result.', ['result'])
+
+# Web
+HTTP_REQUEST_SECONDS = Histogram('call_automation_http_request_seconds',
+                                 'Flask request latency.', ['endpoint', 'method', 'status'])
+
+
+def init_app(app):
+    """Time every Flask request and expose /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus metrics endpoint"""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+class JsonLogFormatter(logging.Formatter):
+    """One JSON object per log line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class KeyValueLogFormatter(logging.Formatter):
+    """One key=value line per record, free text quoted and escaped"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = (f'time="{self.formatTime(record)}" level={record.levelname} logger={record.name} '
+                f'thread="{_escape(record.threadName)}" msg="{_escape(record.getMessage())}"')
+        if record.exc_info:
+            line += f' exc_info="{_escape(self.formatException(record.exc_info))}"'
+        return line
+
+
+def setup_logging():
+    """Configure the root logger from Config.LOG_LEVEL and Config.LOG_FORMAT"""
+    handler = logging.StreamHandler()
+    if Config.LOG_FORMAT == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(KeyValueLogFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO))
@@ -1,5 +1,10 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import inspect, text
+
+# Upper bounds (seconds) of the call duration histogram buckets in CallRollup;
+# the last bucket counts everything longer than the final bound.
+DURATION_BUCKETS = (10, 30, 60, 120, 300)
 
 class CallLog(db.Model):
     """Model for storing call logs"""
@@ -7,13 +12,17 @@ class CallLog(db.Model):
     phone_number = db.Column(db.String(20), nullable=False)
     caller_name = db.Column(db.String(100))
     call_status = db.Column(db.String(20), nullable=False)  # Not Called, Connected, Disconnected, Forwarded, Accepted
-    call_sid = db.Column(db.String(100))  # Twilio Call SID
+    call_sid = db.Column(db.String(100), index=True)  # Twilio Call SID
+    queue_id = db.Column(db.Integer, db.ForeignKey('call_queue.id', ondelete='SET NULL'), index=True)
+    queue_unlinked = db.Column(db.Boolean, default=False)  # queue row replaced by a later reload
     start_time = db.Column(db.DateTime, default=datetime.utcnow)
     end_time = db.Column(db.DateTime)
     duration = db.Column(db.Integer)  # Duration in seconds
     response = db.Column(db.String(20))  # Accept, Forward, Reject
     notes = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    campaign = db.Column(db.String(100))
+    script = db.Column(db.String(50))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
@@ -27,11 +36,14 @@ class CallLog(db.Model):
             'caller_name': self.caller_name,
             'call_status': self.call_status,
             'call_sid': self.call_sid,
+            'queue_id': self.queue_id,
             'start_time': self.start_time.isoformat() if self.start_time else None,
             'end_time': self.end_time.isoformat() if self.end_time else None,
             'duration': self.duration,
             'response': self.response,
             'notes': self.notes,
+            'campaign': self.campaign,
+            'script': self.script,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -44,6 +56,7 @@ class CallQueue(db.Model):
     priority = db.Column(db.Integer, default=1)
     status = db.Column(db.String(20), default='Not Called')
     assigned_script = db.Column(db.String(50), default='default')
+    campaign = db.Column(db.String(100), default='default')
     scheduled_time = db.Column(db.DateTime)
     attempts = db.Column(db.Integer, default=0)
     max_attempts = db.Column(db.Integer, default=3)
@@ -62,9 +75,84 @@ class CallQueue(db.Model):
             'priority': self.priority,
             'status': self.status,
             'assigned_script': self.assigned_script,
+            'campaign': self.campaign,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'attempts': self.attempts,
             'max_attempts': self.max_attempts,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+class DataVersion(db.Model):
+    """Single-row counter bumped on every committed write, used for API ETags"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DataVersion {self.version}>'
+
+class WebhookEvent(db.Model):
+    """Ids of processed webhook deliveries, used to ignore repeats"""
+    event_id = db.Column(db.String(100), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.event_id}>'
+
+class CallRollup(db.Model):
+    """Hourly call outcome counters per campaign and script
+
+    Every dial attempt adds one row count under its outcome (Connected or
+    Failed) and every recipient response adds one under Accepted or Forwarded,
+    together with the call duration. Rows are keyed on the hour the call
+    started, so answer rates per hour are responses / dial attempts.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('campaign', 'script', 'hour', 'outcome', name='uq_call_rollup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    campaign = db.Column(db.String(100), nullable=False)
+    script = db.Column(db.String(50), nullable=False)
+    hour = db.Column(db.DateTime, nullable=False, index=True)
+    outcome = db.Column(db.String(20), nullable=False)
+    call_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_count = db.Column(db.Integer, nullable=False, default=0)
+    duration_sum = db.Column(db.Integer, nullable=False, default=0)
+    # duration_bucket_0 .. duration_bucket_5, see DURATION_BUCKETS
+    duration_bucket_0 = db.Column(db.Integer, nullable=False, default=0)
+    duration_bucket_1 = db.Column(db.Integer, nullable=False, default=0)
+    duration_bucket_2 = db.Column(db.Integer, nullable=False, default=0)
+    duration_bucket_3 = db.Column(db.Integer, nullable=False, default=0)
+    duration_bucket_4 = db.Column(db.Integer, nullable=False, default=0)
+    duration_bucket_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CallRollup {self.campaign}/{self.script} {self.hour} {self.outcome}: {self.call_count}>'
+
+
+def upgrade_schema():
+    """Bring tables created by an older version up to date
+
+    db.create_all() only creates missing tables, so new nullable columns are
+    added with ALTER TABLE and missing indexes are created here.
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                ))
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
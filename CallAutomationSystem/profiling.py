@@ -0,0 +1,168 @@
+import cProfile
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import event
+from config import Config
+from instrumentation import Histogram
+
+SQL_QUERIES_PER_REQUEST = Histogram('call_automation_sql_queries_per_request',
+                                    'SQL statements executed by one Flask request.', ['endpoint'],
+                                    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 1000))
+SQL_SECONDS_PER_REQUEST = Histogram('call_automation_sql_seconds_per_request',
+                                    'Time spent in SQL by one Flask request.', ['endpoint'])
+
+MAX_SAMPLE_SECONDS = 300
+
+# Per-thread SQL counters; only requests install one, so other threads pay a
+# single attribute lookup per statement.
+_sql_stats = threading.local()
+
+# cProfile is process-wide on Python 3.12+, so one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, thread_name: Optional[str] = None, interval: float = None) -> str:
+    """Sample thread stacks for a while and return them in folded format
+
+    Each output line is "outer;inner;leaf count", the input format of
+    flamegraph.pl and speedscope. With thread_name only threads whose name
+    starts with it are sampled (e.g. "dialer" or "db-writer").
+    """
+    interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+    seconds = min(seconds, MAX_SAMPLE_SECONDS)
+    own_ident = threading.get_ident()
+    stacks = StackCounter()
+
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if ident == own_ident or (thread_name and not name.startswith(thread_name)):
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(name)
+            stacks[';'.join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def is_admin_request(request) -> bool:
+    """True when the request carries the configured admin token"""
+    token = Config.ADMIN_TOKEN
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    """Enable a new profiler, or return None while another one is running"""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (e.g. a debugger) holds the interpreter hook
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def _stop_profiler(profiler: cProfile.Profile):
+    profiler.disable()
+    _profile_lock.release()
+
+
+def _profile_path(endpoint: str) -> str:
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+    return os.path.join(Config.PROFILE_DIR, f"{endpoint}-{stamp}-{threading.get_ident()}.prof")
+
+
+def init_app(app, engine):
+    """Register SQL counting, per-request cProfile and the admin sampling route"""
+    from flask import Response, abort, g, request
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(_sql_stats, 'current', None)
+        if stats is not None:
+            stats['started'] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = getattr(_sql_stats, 'current', None)
+        if stats is not None and 'started' in stats:
+            stats['count'] += 1
+            stats['seconds'] += time.perf_counter() - stats.pop('started')
+
+    @app.before_request
+    def _start_request_profiling():
+        _sql_stats.current = {'count': 0, 'seconds': 0.0}
+
+        wants_profile = request.headers.get('X-Profile') == '1' and is_admin_request(request)
+        if Config.PROFILE_ALL_REQUESTS or wants_profile:
+            g.profiler = _start_profiler()
+            g.profile_skipped = g.profiler is None
+
+    @app.after_request
+    def _finish_request_profiling(response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+            path = _profile_path(request.endpoint or 'unknown')
+            profiler.dump_stats(path)
+            response.headers['X-Profile-File'] = path
+            logging.info(f"Saved request profile to {path}")
+        elif g.pop('profile_skipped', False):
+            response.headers['X-Profile-Skipped'] = 'another profile is running'
+
+        stats = getattr(_sql_stats, 'current', None)
+        _sql_stats.current = None
+        if stats is not None:
+            endpoint = request.endpoint or 'unknown'
+            SQL_QUERIES_PER_REQUEST.observe(stats['count'], endpoint=endpoint)
+            SQL_SECONDS_PER_REQUEST.observe(stats['seconds'], endpoint=endpoint)
+            if profiler is not None or is_admin_request(request):
+                response.headers['X-SQL-Queries'] = str(stats['count'])
+                response.headers['X-SQL-Time-Ms'] = f"{stats['seconds'] * 1000:.2f}"
+        return response
+
+    @app.teardown_request
+    def _cleanup_request_profiling(exc):
+        # after_request is skipped when an exception propagates (debug mode)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            _stop_profiler(profiler)
+        _sql_stats.current = None
+
+    @app.route('/admin/profile/sample')
+    def admin_profile_sample():
+        """Sample running threads for N seconds and return folded stacks"""
+        if not is_admin_request(request):
+            abort(404)
+
+        seconds = request.args.get('seconds', 10, type=float)
+        thread_name = request.args.get('thread') or None
+        folded = sample_stacks(seconds, thread_name=thread_name)
+
+        filename = f"profile-{thread_name or 'all'}-{datetime.utcnow():%Y%m%dT%H%M%S}.folded"
+        return Response(folded, mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
@@ -0,0 +1,119 @@
+import json
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from flask import Response, request
+from sqlalchemy import func, insert, select, update
+from call_queue_buffer import CLAIMED_STATUS
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; the stdlib encoder is used as a fallback
+    orjson = None
+
+# Columns served by the JSON call-log APIs, in output order
+CALL_LOG_FIELDS = (
+    'id', 'phone_number', 'caller_name', 'call_status', 'call_sid', 'queue_id',
+    'start_time', 'end_time', 'duration', 'response', 'notes',
+    'campaign', 'script', 'created_at', 'updated_at'
+)
+
+# Queue statuses reported by the stats endpoint, keyed by output field
+QUEUE_STATUS_FIELDS = {
+    'not_called': ('Not Called',),
+    'claimed': (CLAIMED_STATUS,),
+    'connected': ('Connected',),
+    'accepted': ('Accepted',),
+    'forwarded': ('Forwarded',),
+    'failed': ('Failed',),
+}
+
+DATA_VERSION_ID = 1
+
+
+def _json_default(value):
+    """Fallback serializer for the stdlib encoder"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload) -> bytes:
+    """Serialize a payload to JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        # orjson writes naive datetimes in the same format as isoformat()
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+
+def bump_data_version(conn):
+    """Writer commit hook: advance the data version counter"""
+    from models import DataVersion
+
+    result = conn.execute(
+        update(DataVersion)
+        .where(DataVersion.id == DATA_VERSION_ID)
+        .values(version=DataVersion.version + 1)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(DataVersion).values(id=DATA_VERSION_ID, version=1))
+
+
+def get_data_version() -> int:
+    """Current data version, changes whenever any write is committed"""
+    from app import db
+    from models import DataVersion
+
+    version = db.session.execute(
+        select(DataVersion.version).where(DataVersion.id == DATA_VERSION_ID)
+    ).scalar()
+    return version or 0
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already has this ETag, else None"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def json_response(payload, etag: Optional[str] = None) -> Response:
+    """Build a JSON response with the fast encoder"""
+    response = Response(dumps(payload), mimetype='application/json')
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def fetch_call_logs(limit: int, offset: int = 0) -> List[Dict]:
+    """Newest call logs as plain dicts, without hydrating ORM objects"""
+    from app import db
+    from models import CallLog
+
+    columns = [getattr(CallLog, field) for field in CALL_LOG_FIELDS]
+    rows = db.session.execute(
+        select(*columns)
+        .order_by(CallLog.created_at.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+    return [dict(zip(CALL_LOG_FIELDS, row)) for row in rows]
+
+
+def fetch_queue_statistics() -> Dict:
+    """Queue status counts from a single grouped query"""
+    from app import db
+    from models import CallQueue
+
+    counts = dict(db.session.execute(
+        select(CallQueue.status, func.count()).group_by(CallQueue.status)
+    ).all())
+
+    stats = {'total_calls': sum(counts.values())}
+    for field, statuses in QUEUE_STATUS_FIELDS.items():
+        stats[field] = sum(counts.get(status, 0) for status in statuses)
+    return stats
+
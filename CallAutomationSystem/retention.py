@@ -0,0 +1,228 @@
+import gzip
+import json
+import logging
+import os
+import sys
+from datetime import date, datetime, time as dt_time, timedelta
+from itertools import chain, groupby, islice
+from typing import Dict, Iterator, List, Optional
+import click
+from flask import Response
+from sqlalchemy import delete, select
+from config import Config
+from db_writer import db_writer
+from exporter import ExportError, build_export_query, iter_jsonl, iter_partitions, parse_date, write_parquet
+from read_layer import dumps
+
+ARCHIVE_FORMATS = ('jsonl.gz', 'parquet')
+DATETIME_FIELDS = ('start_time', 'end_time', 'created_at', 'updated_at')
+
+
+def archive_root() -> str:
+    """Directory holding the date-partitioned call log archive"""
+    return os.path.join(Config.ARCHIVE_DIR, 'call_logs')
+
+
+def retention_cutoff(days: int = None) -> datetime:
+    """Start of the oldest day kept in the hot table
+
+    Cutting at midnight means a day is always archived in a single run, so a
+    rerun after a crash rewrites the same partition file instead of adding a
+    duplicate one.
+    """
+    days = Config.LOG_RETENTION_DAYS if days is None else days
+    return datetime.combine(datetime.utcnow().date() - timedelta(days=days), dt_time.min)
+
+
+def _chunks(rows, size: int) -> Iterator[List]:
+    """Split an iterable of rows into lists of at most size rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_partition(day: date, columns, rows, fmt: str) -> str:
+    """Write one day of call logs to its partition directory and return the file path"""
+    first = next(rows)
+    directory = os.path.join(archive_root(), f"date={day.isoformat()}")
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, f"part-{first.id}.{fmt}")
+    tmp_path = path + '.tmp'
+    chunks = _chunks(chain([first], rows), Config.EXPORT_CHUNK_SIZE)
+
+    if fmt == 'parquet':
+        write_parquet(tmp_path, columns, chunks)
+    else:
+        with gzip.open(tmp_path, 'wb') as f:
+            for data in iter_jsonl([column.name for column in columns], chunks):
+                f.write(data)
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def archive_call_logs(engine, days: int = None, fmt: str = None) -> Dict:
+    """Move call logs older than the retention period into archive files"""
+    from models import CallLog, WebhookEvent
+
+    fmt = fmt or Config.ARCHIVE_FORMAT
+    if fmt not in ARCHIVE_FORMATS:
+        raise ExportError(f"Unknown archive format: {fmt}")
+
+    cutoff = retention_cutoff(days)
+    query = (
+        select(*CallLog.__table__.columns)
+        .where(CallLog.created_at < cutoff)
+        .order_by(CallLog.created_at, CallLog.id)
+    )
+    columns = list(query.selected_columns)
+
+    archived = {'rows': 0}
+    max_ids = {}
+
+    def tracked(rows):
+        for row in rows:
+            archived['rows'] += 1
+            day = row.created_at.date()
+            max_ids[day] = max(max_ids.get(day, row.id), row.id)
+            yield row
+
+    def delete_day(day: date, max_id: int):
+        day_start = datetime.combine(day, dt_time.min)
+
+        def delete_archived(conn):
+            return conn.execute(
+                delete(CallLog)
+                .where(CallLog.created_at >= day_start,
+                       CallLog.created_at < day_start + timedelta(days=1),
+                       CallLog.id <= max_id)
+            ).rowcount
+
+        return db_writer.execute(delete_archived)
+
+    # Each day is deleted in one transaction right after its file is in place,
+    # so a crash leaves a day either fully in the table (a rerun rewrites the
+    # same file) or fully archived, never split across two files
+    files = []
+    deleted = 0
+    rows = tracked(chain.from_iterable(iter_partitions(engine, query)))
+    for day, day_rows in groupby(rows, key=lambda row: row.created_at.date()):
+        files.append(_write_partition(day, columns, day_rows, fmt))
+        deleted += delete_day(day, max_ids[day])
+
+    # Webhook dedup ids only matter while deliveries can still be retried
+    db_writer.execute(lambda conn: conn.execute(delete(WebhookEvent).where(WebhookEvent.created_at < cutoff)))
+
+    logging.info(f"Archived {archived['rows']} call logs older than {cutoff.date()} into {len(files)} files")
+    return {'cutoff': cutoff.isoformat(), 'archived': archived['rows'], 'deleted': deleted, 'files': files}
+
+
+def _archive_files(start: Optional[datetime], end: Optional[datetime]) -> Iterator[str]:
+    """Archive files whose partition day overlaps [start, end), oldest first"""
+    root = archive_root()
+    if not os.path.isdir(root):
+        return
+
+    for directory in sorted(os.listdir(root)):
+        if not directory.startswith('date='):
+            continue
+        day = datetime.fromisoformat(directory[len('date='):])
+        if start and day + timedelta(days=1) <= start:
+            continue
+        if end and day >= end:
+            continue
+
+        partition = os.path.join(root, directory)
+        for name in sorted(os.listdir(partition)):
+            if name.endswith(ARCHIVE_FORMATS):
+                yield os.path.join(partition, name)
+
+
+def _read_archive(path: str) -> Iterator[Dict]:
+    """Read call log records back from one archive file"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=Config.EXPORT_CHUNK_SIZE):
+            yield from batch.to_pylist()
+        return
+
+    with gzip.open(path, 'rb') as f:
+        for line in f:
+            record = json.loads(line)
+            for field in DATETIME_FIELDS:
+                if record.get(field):
+                    record[field] = datetime.fromisoformat(record[field])
+            yield record
+
+
+def iter_call_log_history(engine, start: datetime = None, end: datetime = None,
+                          status: str = None) -> Iterator[Dict]:
+    """Call logs from the archive and the hot table, oldest archive first
+
+    Filters match the export API: status on call_status and a created_at
+    range with start inclusive and end exclusive.
+    """
+    for path in _archive_files(start, end):
+        for record in _read_archive(path):
+            created_at = record.get('created_at')
+            if start and (created_at is None or created_at < start):
+                continue
+            if end and (created_at is None or created_at >= end):
+                continue
+            if status and record.get('call_status') != status:
+                continue
+            yield record
+
+    query = build_export_query('call_logs', status=status, start=start, end=end)
+    for rows in iter_partitions(engine, query):
+        for row in rows:
+            yield dict(row._mapping)
+
+
+def history_response(engine, start: datetime = None, end: datetime = None,
+                     status: str = None) -> Response:
+    """Stream call log history as JSON Lines"""
+    records = iter_call_log_history(engine, start=start, end=end, status=status)
+    chunks = (
+        b''.join(dumps(record) + b'\n' for record in chunk)
+        for chunk in _chunks(records, Config.EXPORT_CHUNK_SIZE)
+    )
+    return Response(chunks, mimetype='application/x-ndjson')
+
+
+@click.group('retention')
+def retention_cli():
+    """Call log retention and archive commands."""
+
+
+@retention_cli.command('archive')
+@click.option('--days', type=int, help='Keep this many days in the database (default: LOG_RETENTION_DAYS).')
+@click.option('--format', 'fmt', type=click.Choice(ARCHIVE_FORMATS), help='Archive file format (default: ARCHIVE_FORMAT).')
+def archive_command(days, fmt):
+    """Move old call logs into compressed archive files."""
+    from app import db
+
+    result = archive_call_logs(db.engine, days=days, fmt=fmt)
+    click.echo(f"Archived {result['archived']} call logs older than {result['cutoff']} "
+               f"into {len(result['files'])} files")
+
+
+@retention_cli.command('history')
+@click.option('--start', help='Only rows created at or after this ISO date.')
+@click.option('--end', help='Only rows created before this ISO date.')
+@click.option('--status', help='Call status to filter on.')
+def history_command(start, end, status):
+    """Print call logs from the archive and the database as JSON Lines."""
+    from app import db
+
+    try:
+        records = iter_call_log_history(db.engine, start=parse_date(start), end=parse_date(end), status=status)
+        for record in records:
+            sys.stdout.buffer.write(dumps(record) + b'\n')
+    except ExportError as e:
+        raise click.UsageError(str(e))
@@ -87,6 +87,9 @@ class CallAutomationDashboard {
             
             // Update recent calls
             await this.updateRecentCalls();
+
+            // Update campaign analytics
+            await this.updateCampaignAnalytics();
             
         } catch (error) {
             console.error('Error updating dashboard:', error);
@@ -131,6 +134,40 @@ class CallAutomationDashboard {
         }
     }
 
+    async updateCampaignAnalytics() {
+        try {
+            const response = await fetch('/api/analytics/summary?hours=24');
+            const rows = await response.json();
+
+            const tableBody = document.getElementById('campaign-analytics-table');
+            if (tableBody) {
+                tableBody.innerHTML = this.renderCampaignAnalyticsTable(rows);
+            }
+
+        } catch (error) {
+            console.error('Error updating campaign analytics:', error);
+        }
+    }
+
+    renderCampaignAnalyticsTable(rows) {
+        if (!rows || rows.length === 0) {
+            return '<tr><td colspan="8" class="text-center text-muted">No calls in the last 24 hours</td></tr>';
+        }
+
+        return rows.map(row => `
+            <tr>
+                <td>${row.campaign}</td>
+                <td>${row.script}</td>
+                <td>${row.attempts}</td>
+                <td>${row.connected}</td>
+                <td>${row.accepted}</td>
+                <td>${row.forwarded}</td>
+                <td>${row.answer_rate !== null ? (row.answer_rate * 100).toFixed(1) + '%' : '-'}</td>
+                <td>${row.avg_duration !== null ? this.formatDuration(Math.round(row.avg_duration)) : '-'}</td>
+            </tr>
+        `).join('');
+    }
+
     updateStatusCard(elementId, value) {
         const element = document.getElementById(elementId);
         if (element) {
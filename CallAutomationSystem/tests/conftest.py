@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# The app binds its engine at import, so point it at a throwaway database first
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def system():
+    """CallAutomationSystem on an empty, fully migrated database"""
+    from app import app, db, init_db
+    from call_automation import CallAutomationSystem
+
+    init_db()
+    with app.app_context():
+        yield CallAutomationSystem()
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,45 @@
+from datetime import datetime
+import retention
+from analytics import query_rollups, rebuild_rollups
+from config import Config
+from db_writer import db_writer
+
+
+def dial(system, call_sid):
+    next_call = system.call_queue.pop()
+    call_log = dict(
+        phone_number=next_call.phone_number, caller_name=next_call.caller_name,
+        call_status='Connected', call_sid=call_sid, start_time=datetime.utcnow(),
+        campaign=next_call.campaign, script=next_call.assigned_script
+    )
+    db_writer.execute(system._record_call_job(next_call.id, 'Connected', call_log))
+
+
+def outcome_counts():
+    return {row['outcome']: row['call_count'] for row in query_rollups(group_by=('outcome',))}
+
+
+def test_rebuild_keeps_events_recorded_during_the_scan(system, tmp_path, monkeypatch):
+    from app import db
+
+    monkeypatch.setattr(Config, 'ARCHIVE_DIR', str(tmp_path))
+    system._replace_queue([
+        {'phone_number': f'+{i}', 'caller_name': 'Test', 'priority': 1,
+         'assigned_script': 'default', 'campaign': 'default'}
+        for i in range(2)
+    ])
+    dial(system, 'CA1')
+
+    history = retention.iter_call_log_history
+
+    def busy_history(engine, **filters):
+        yield from history(engine, **filters)
+        # A response and a new dial land after the scan read the hot table
+        system.handle_call_response('CA1', '1')
+        dial(system, 'CA2')
+
+    monkeypatch.setattr(retention, 'iter_call_log_history', busy_history)
+    rebuild_rollups(db.engine)
+    system.call_queue.release()
+
+    assert outcome_counts() == {'Accepted': 1, 'Connected': 2}
@@ -0,0 +1,18 @@
+from datetime import datetime
+from sqlalchemy import insert
+from db_writer import db_writer
+
+
+def test_page_sizes_are_clamped_to_at_least_one(system):
+    from app import app
+    from models import CallLog
+
+    db_writer.execute(lambda conn: conn.execute(insert(CallLog), [
+        {'phone_number': f'+{i}', 'call_status': 'Connected', 'created_at': datetime.utcnow()}
+        for i in range(3)
+    ]))
+    client = app.test_client()
+
+    assert len(client.get('/api/recent-calls?limit=-1').get_json()) == 1
+    assert len(client.get('/api/call-logs?per_page=-1').get_json()) == 1
+    assert len(client.get('/api/call-logs?per_page=0').get_json()) == 1
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from call_queue_buffer import CLAIMED_STATUS, CallQueueBuffer
+from db_writer import db_writer
+
+
+def load_queue(system, count):
+    system._replace_queue([
+        {'phone_number': f'+{i}', 'caller_name': 'Test', 'priority': 1,
+         'assigned_script': 'default', 'campaign': 'default'}
+        for i in range(count)
+    ])
+
+
+def test_claimed_rows_are_counted_separately(system):
+    load_queue(system, 5)
+    buffer = CallQueueBuffer(batch_size=3, low_water_mark=0)
+    buffer.pop()
+
+    stats = system.get_queue_statistics()
+    assert (stats['not_called'], stats['claimed']) == (2, 3)
+    buffer.release()
+
+
+def test_only_stale_claims_are_reset(system):
+    from models import CallQueue
+
+    load_queue(system, 4)
+    dead_dialer = CallQueueBuffer(batch_size=2, low_water_mark=0)
+    dead_dialer.pop()
+    db_writer.execute(lambda conn: conn.execute(
+        update(CallQueue)
+        .where(CallQueue.status == CLAIMED_STATUS)
+        .values(updated_at=datetime.utcnow() - timedelta(hours=2))
+    ))
+    live_dialer = CallQueueBuffer(batch_size=1, low_water_mark=0)
+    live_dialer.pop()
+
+    assert CallQueueBuffer().reset_stale_claims(max_age=3600) == 2
+    stats = system.get_queue_statistics()
+    assert (stats['not_called'], stats['claimed']) == (3, 1)
+    dead_dialer.clear()
+    live_dialer.release()
+
+
+class ExitHandlers:
+    """Stand-in for the atexit module that records live handlers"""
+
+    def __init__(self):
+        self.handlers = []
+
+    def register(self, func):
+        self.handlers.append(func)
+
+    def unregister(self, func):
+        self.handlers = [handler for handler in self.handlers if handler != func]
+
+
+def test_exit_handler_is_only_held_while_claims_are(system, monkeypatch):
+    import call_queue_buffer
+
+    exit_handlers = ExitHandlers()
+    monkeypatch.setattr(call_queue_buffer, 'atexit', exit_handlers)
+    load_queue(system, 4)
+    buffer = CallQueueBuffer(batch_size=2, low_water_mark=0)
+    assert exit_handlers.handlers == []
+
+    for _ in range(2):
+        buffer.pop()
+        assert exit_handlers.handlers == [buffer.release]
+        buffer.release()
+        assert exit_handlers.handlers == []
@@ -0,0 +1,124 @@
+from datetime import datetime
+from sqlalchemy import select
+from db_writer import db_writer
+
+
+def queue_rows(*phone_numbers):
+    return [
+        {'phone_number': number, 'caller_name': 'Test', 'priority': 1,
+         'assigned_script': 'default', 'campaign': 'default'}
+        for number in phone_numbers
+    ]
+
+
+def dial(system, call_sid):
+    """Claim the next queued call and store a connected log for it, like the dialer loop"""
+    next_call = system.call_queue.pop()
+    call_log = dict(
+        phone_number=next_call.phone_number,
+        caller_name=next_call.caller_name,
+        call_status='Connected',
+        call_sid=call_sid,
+        start_time=datetime.utcnow(),
+        campaign=next_call.campaign,
+        script=next_call.assigned_script
+    )
+    db_writer.execute(system._record_call_job(next_call.id, 'Connected', call_log))
+    system.call_queue.release()
+    return next_call
+
+
+def queue_statuses():
+    from app import db
+    from models import CallQueue
+
+    db.session.remove()
+    return dict(db.session.execute(select(CallQueue.phone_number, CallQueue.status)).all())
+
+
+def test_response_updates_the_dialed_queue_row(system):
+    system._replace_queue(queue_rows('+1', '+2'))
+    dialed = dial(system, 'CA1')
+
+    assert system.handle_call_response('CA1', '1') == {"success": True, "response": "Accepted"}
+    assert queue_statuses()[dialed.phone_number] == 'Accepted'
+
+
+def test_late_response_after_reload_leaves_new_queue_row_alone(system):
+    system._replace_queue(queue_rows('+1'))
+    dial(system, 'CA1')
+
+    # A new upload contains the same number before the old call is answered
+    system._replace_queue(queue_rows('+1'))
+
+    assert system.handle_call_response('CA1', '1') == {"success": True, "response": "Accepted"}
+    assert queue_statuses() == {'+1': 'Not Called'}
+
+
+def test_reload_during_dial_leaves_new_queue_row_alone(system):
+    from app import db
+    from models import CallLog, CallQueue
+
+    system._replace_queue(queue_rows('+1OLD'))
+    next_call = system.call_queue.pop()
+
+    # The queue is replaced while the call is in flight; SQLite hands the
+    # freed id to the new row
+    system._replace_queue(queue_rows('+2NEW'))
+    call_log = dict(
+        phone_number=next_call.phone_number, caller_name=next_call.caller_name,
+        call_status='Connected', call_sid='CA1', start_time=datetime.utcnow(),
+        campaign=next_call.campaign, script=next_call.assigned_script
+    )
+    db_writer.execute(system._record_call_job(next_call.id, 'Connected', call_log))
+
+    assert system.handle_call_response('CA1', '1') == {"success": True, "response": "Accepted"}
+    assert queue_statuses() == {'+2NEW': 'Not Called'}
+    assert db.session.execute(select(CallQueue.attempts)).scalar() == 0
+    log = db.session.execute(select(CallLog.queue_id, CallLog.queue_unlinked)).one()
+    assert (log.queue_id, log.queue_unlinked) == (None, True)
+
+
+def test_legacy_log_without_queue_link_falls_back_to_phone_number(system):
+    from models import CallLog
+    from sqlalchemy import insert
+
+    system._replace_queue(queue_rows('+1'))
+    db_writer.execute(lambda conn: conn.execute(insert(CallLog).values(
+        phone_number='+1', call_status='Connected', call_sid='CA1', start_time=datetime.utcnow()
+    )))
+
+    system.handle_call_response('CA1', '2')
+    assert queue_statuses() == {'+1': 'Forwarded'}
+
+
+def test_event_id_of_unknown_call_is_not_consumed(system):
+    system._replace_queue(queue_rows('+1'))
+
+    # The webhook arrives before the dial's log row is committed
+    assert system.handle_call_response('CA1', '1', event_id='evt-1') == {"error": "Call not found"}
+
+    dial(system, 'CA1')
+    assert system.handle_call_response('CA1', '1', event_id='evt-1') == {"success": True, "response": "Accepted"}
+    assert system.handle_call_response('CA1', '1', event_id='evt-1') == {
+        "success": True, "response": "Accepted", "duplicate": True
+    }
+
+
+def test_writes_that_change_nothing_keep_the_data_version(system):
+    from read_layer import get_data_version
+
+    system._replace_queue(queue_rows('+1'))
+    dial(system, 'CA1')
+    system.handle_call_response('CA1', '1', event_id='evt-1')
+    version = get_data_version()
+
+    system.handle_call_response('CA1', '1', event_id='evt-1')
+    system.handle_call_response('CA1', '2')
+    assert system.call_queue.pop() is None
+    system.call_queue.release()
+    assert get_data_version() == version
+
+    system.handle_call_response('CA2', '1')
+    system._replace_queue(queue_rows('+2'))
+    assert get_data_version() == version + 1
@@ -0,0 +1,13 @@
+import logging
+import shlex
+from instrumentation import KeyValueLogFormatter
+
+
+def test_key_value_log_lines_survive_quotes_and_newlines():
+    record = logging.LogRecord('root', logging.ERROR, __file__, 1, 'Bad row %s', ('"x"\nnext=1',), None)
+    line = KeyValueLogFormatter().format(record)
+
+    assert '\n' not in line
+    fields = dict(pair.split('=', 1) for pair in shlex.split(line))
+    assert fields['msg'] == 'Bad row "x"\\nnext=1'
+    assert 'next' not in fields
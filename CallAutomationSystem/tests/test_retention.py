@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func, insert, select
+import retention
+from config import Config
+from db_writer import db_writer
+
+
+@pytest.fixture
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ARCHIVE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def seed_old_logs(days_ago, per_day):
+    from models import CallLog
+
+    rows = []
+    for offset in days_ago:
+        day = datetime.utcnow().replace(hour=12) - timedelta(days=offset)
+        rows.extend(
+            {'phone_number': f'+{offset}{i}', 'call_status': 'Failed', 'created_at': day + timedelta(minutes=i)}
+            for i in range(per_day)
+        )
+    db_writer.execute(lambda conn: conn.execute(insert(CallLog), rows))
+    return len(rows)
+
+
+class CrashingWriter:
+    """Writer that fails its nth job, like a process dying mid-archive"""
+
+    def __init__(self, fail_on):
+        self.calls = 0
+        self.fail_on = fail_on
+
+    def execute(self, job):
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("crash")
+        return db_writer.execute(job)
+
+
+def test_rerun_after_crash_does_not_archive_rows_twice(system, archive_dir, monkeypatch):
+    from app import db
+    from models import CallLog
+
+    total = seed_old_logs(days_ago=(200, 201), per_day=5)
+
+    # The second day's file is written, then the process dies before its delete
+    monkeypatch.setattr(retention, 'db_writer', CrashingWriter(fail_on=2))
+    with pytest.raises(RuntimeError):
+        retention.archive_call_logs(db.engine, days=90)
+    monkeypatch.setattr(retention, 'db_writer', db_writer)
+
+    result = retention.archive_call_logs(db.engine, days=90)
+    assert result['deleted'] == 5
+
+    history = list(retention.iter_call_log_history(db.engine))
+    assert len(history) == total
+    assert len({record['id'] for record in history}) == total
+    assert db.session.execute(select(func.count()).select_from(CallLog)).scalar() == 0